@@ -1,29 +1,57 @@
 import logging
-import time
+from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
 from fastapi.responses import JSONResponse
 
-from app.config.settings import get_db_service, get_embedding_service
-from app.models.schemas import UploadResponse
+from app.config.settings import (
+    get_db_service,
+    get_ingestion_service,
+    get_job_queue,
+    ingestion_config,
+)
+from app.models.schemas import (
+    BulkUploadResponse,
+    ChunkResponse,
+    DocumentResponse,
+    JobStatusResponse,
+    UploadJobResponse,
+    UploadResponse,
+)
 from app.services.database_service import DatabaseService
-from app.services.embedding_service import EmbeddingService
+from app.services.ingestion_service import IngestionService
+from app.services.job_queue import IngestionJobQueue
 from app.utils.exceptions import handle_exception
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Largest batch accepted by the by-id fetch endpoints
+MAX_FETCH_IDS = 100
 
-@router.post("/upload", response_model=UploadResponse)
+
+def parse_ids(ids: str) -> List[int]:
+    """Comma-separated ids from the path, de-duplicated in order"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Los ids deben ser números separados por comas")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un id")
+    if len(parsed) > MAX_FETCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Se permiten como máximo {MAX_FETCH_IDS} ids por consulta"
+        )
+    return parsed
+
+
+@router.post("/upload", response_model=UploadJobResponse, status_code=202)
 async def upload_endpoint(
     file: UploadFile,
-    db_service: DatabaseService = Depends(get_db_service),
-    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    job_queue: IngestionJobQueue = Depends(get_job_queue),
 ):
-    """Document upload endpoint"""
+    """Document upload endpoint: queues the document and returns its job right away"""
     try:
-        start_time = time.time()
-
         # Read file content
         content_bytes = await file.read()
         text_content = content_bytes.decode("utf-8", errors="ignore")
@@ -31,29 +59,112 @@ async def upload_endpoint(
         if not text_content.strip():
             raise HTTPException(status_code=400, detail="El archivo está vacío")
 
-        # Generate embedding
-        embedding = await embedding_service.get_embedding(text_content)
-        if not embedding:
-            raise HTTPException(status_code=500, detail="No se pudo generar el embedding")
+        # Chunking, embedding and storing happen in the background workers
+        job = await job_queue.enqueue(file.filename, text_content, len(content_bytes))
 
-        # Store in database
-        doc = await db_service.create_document(
-            filename=file.filename, content=text_content, embedding=embedding
-        )
+        logger.info(f"Document {file.filename} queued as job {job['id']}")
 
-        processing_time = (time.time() - start_time) * 1000
+        return {
+            "message": "Documento en cola para procesamiento",
+            "job_id": job["id"],
+            "filename": file.filename,
+            "status": job["status"],
+            "status_url": f"/documents/jobs/{job['id']}",
+        }
 
-        logger.info(f"Document uploaded successfully: {doc.id}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in document upload: {e}")
+        http_exc = handle_exception(e)
+        return JSONResponse(status_code=http_exc.status_code, content={"detail": http_exc.detail})
 
+
+@router.post("/upload/stream", response_model=UploadResponse)
+async def upload_stream_endpoint(
+    file: UploadFile,
+    ingestion_service: IngestionService = Depends(get_ingestion_service),
+):
+    """Large-file upload: chunks are embedded and stored while the file is read"""
+
+    async def read_blocks():
+        while block := await file.read(ingestion_config.stream_block_size):
+            yield block
+
+    try:
+        result = await ingestion_service.ingest_stream(
+            file.filename,
+            read_blocks(),
+            file.size,
+            prefetch_batches=ingestion_config.stream_prefetch_batches,
+        )
         return {
             "message": "Documento procesado exitosamente",
-            "document_id": doc.id,
             "filename": file.filename,
-            "content_length": len(text_content),
-            "processing_time_ms": processing_time,
+            **result,
         }
 
     except Exception as e:
-        logger.error(f"Error in document upload: {e}")
+        logger.error(f"Error in streaming document upload: {e}")
         http_exc = handle_exception(e)
         return JSONResponse(status_code=http_exc.status_code, content={"detail": http_exc.detail})
+
+
+@router.post("/bulk-upload", response_model=BulkUploadResponse)
+async def bulk_upload_endpoint(
+    files: List[UploadFile],
+    ingestion_service: IngestionService = Depends(get_ingestion_service),
+):
+    """Multi-file upload endpoint with batched embedding and COPY-based writes"""
+
+    async def read_files():
+        for file in files:
+            content_bytes = await file.read()
+            yield {
+                "filename": file.filename,
+                "content": content_bytes.decode("utf-8", errors="ignore"),
+                "file_size": len(content_bytes),
+            }
+
+    try:
+        stats = await ingestion_service.ingest_many(
+            read_files(),
+            concurrency=ingestion_config.bulk_concurrency,
+            write_batch_size=ingestion_config.bulk_write_batch_size,
+        )
+        return {"message": "Documentos procesados exitosamente", **stats}
+
+    except Exception as e:
+        logger.error(f"Error in bulk document upload: {e}")
+        http_exc = handle_exception(e)
+        return JSONResponse(status_code=http_exc.status_code, content={"detail": http_exc.detail})
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status_endpoint(
+    job_id: int,
+    db_service: DatabaseService = Depends(get_db_service),
+):
+    """Status and progress of a queued upload"""
+    job = await db_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+
+@router.get("/chunks/{ids}", response_model=List[ChunkResponse])
+async def get_chunks_endpoint(
+    ids: str,
+    db_service: DatabaseService = Depends(get_db_service),
+):
+    """Full text of search hits, e.g. /documents/chunks/12,40,41"""
+    return await db_service.get_chunks(parse_ids(ids))
+
+
+@router.get("/{ids}", response_model=List[DocumentResponse])
+async def get_documents_endpoint(
+    ids: str,
+    db_service: DatabaseService = Depends(get_db_service),
+):
+    """Full documents by id in one batched query, e.g. /documents/3,7,9"""
+    return await db_service.get_documents(parse_ids(ids))
@@ -1,13 +1,30 @@
+import json
 import logging
 import time
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
-from app.config.settings import get_db_service, get_embedding_service
-from app.models.schemas import QueryRequest, SearchResponse
+from app.config.settings import (
+    get_db_service,
+    get_embedding_migration,
+    get_embedding_service,
+    search_config,
+)
+from app.models.schemas import (
+    BatchQueryRequest,
+    BatchQueryResponse,
+    QueryRequest,
+    SearchHitsRequest,
+    SearchHitsResponse,
+    SearchResponse,
+)
 from app.services.database_service import DatabaseService
+from app.services.embedding_migration import EmbeddingMigration
 from app.services.embedding_service import EmbeddingService
 from app.services.rag_service import RAGService
+from app.utils.exceptions import UpstreamBusyException, ValidationException, handle_exception
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -18,6 +35,7 @@ async def rag_query(
     query: QueryRequest,
     db_service: DatabaseService = Depends(get_db_service),
     embedding_service: EmbeddingService = Depends(get_embedding_service),
+    migration: Optional[EmbeddingMigration] = Depends(get_embedding_migration),
 ):
     """RAG query endpoint"""
     start_time = time.time()
@@ -28,13 +46,21 @@ async def rag_query(
             raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía")
 
         # Create RAG service
-        rag_service = RAGService(embedding_service, db_service)
+        rag_service = RAGService(embedding_service, db_service, migration)
 
         # Process RAG query
         result = await rag_service.rag_query(
-            question=query.question, limit=query.limit, similarity_threshold=0.0
+            question=query.question,
+            limit=query.limit,
+            similarity_threshold=query.similarity_threshold,
+            ef_search=query.ef_search,
+            filters=query.filters(),
         )
 
+        if not query.include_context:
+            # Sources carry chunk ids; clients fetch full text from /documents when needed
+            result = {key: value for key, value in result.items() if key != "context_used"}
+
         total_time = (time.time() - start_time) * 1000
 
         return SearchResponse(
@@ -42,12 +68,130 @@ async def rag_query(
             results=result,
             total_found=len(result.get("sources", [])),
             processing_time_ms=total_time,
+            similarity_threshold_used=query.similarity_threshold,
         )
 
     except HTTPException:
         raise
+    except UpstreamBusyException as e:
+        # Quota exhausted even after retries: tell the client when to come back
+        raise handle_exception(e)
     except Exception as e:
         logger.error(f"Error in RAG query: {e}")
         raise HTTPException(
             status_code=500, detail=f"Error interno del servidor en consulta RAG: {str(e)}"
         )
+
+
+@router.post("/hits", response_model=SearchHitsResponse)
+async def search_hits(
+    query: SearchHitsRequest,
+    db_service: DatabaseService = Depends(get_db_service),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    migration: Optional[EmbeddingMigration] = Depends(get_embedding_migration),
+):
+    """Retrieval only: ids, scores and highlighted snippets, paginated by cursor"""
+    start_time = time.time()
+
+    try:
+        rag_service = RAGService(embedding_service, db_service, migration)
+        page = await rag_service.search_hits(
+            query.question,
+            limit=query.limit,
+            cursor=query.cursor,
+            similarity_threshold=query.similarity_threshold,
+            ef_search=query.ef_search,
+            filters=query.filters(),
+        )
+        return SearchHitsResponse(
+            query=query.question,
+            hits=page["hits"],
+            next_cursor=page["next_cursor"],
+            processing_time_ms=(time.time() - start_time) * 1000,
+        )
+
+    except (ValidationException, UpstreamBusyException) as e:
+        raise handle_exception(e)
+    except Exception as e:
+        logger.error(f"Error in search hits: {e}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor en búsqueda")
+
+
+@router.post("/batch", response_model=BatchQueryResponse)
+async def batch_query(
+    query: BatchQueryRequest,
+    db_service: DatabaseService = Depends(get_db_service),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    migration: Optional[EmbeddingMigration] = Depends(get_embedding_migration),
+):
+    """Many questions at once: one embedding request and one search query for all of them"""
+    start_time = time.time()
+
+    try:
+        rag_service = RAGService(embedding_service, db_service, migration)
+        results = await rag_service.batch_query(
+            query.questions,
+            limit=query.limit,
+            similarity_threshold=query.similarity_threshold,
+            ef_search=query.ef_search,
+            filters=query.filters(),
+            generate=query.generate,
+            concurrency=search_config.batch_generation_concurrency,
+        )
+        if not query.include_context:
+            results = [
+                {key: value for key, value in result.items() if key != "context_used"}
+                for result in results
+            ]
+        return BatchQueryResponse(
+            results=results,
+            total_questions=len(results),
+            processing_time_ms=(time.time() - start_time) * 1000,
+            similarity_threshold_used=query.similarity_threshold,
+        )
+
+    except (ValidationException, UpstreamBusyException) as e:
+        raise handle_exception(e)
+    except Exception as e:
+        logger.error(f"Error in batch query: {e}")
+        raise HTTPException(
+            status_code=500, detail="Error interno del servidor en consulta por lotes"
+        )
+
+
+@router.post("/semantic-search/stream")
+async def rag_query_stream(
+    query: QueryRequest,
+    db_service: DatabaseService = Depends(get_db_service),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    migration: Optional[EmbeddingMigration] = Depends(get_embedding_migration),
+):
+    """Streaming RAG query endpoint (Server-Sent Events)"""
+    if not query.question or not query.question.strip():
+        raise HTTPException(status_code=400, detail="La pregunta no puede estar vacía")
+
+    rag_service = RAGService(embedding_service, db_service, migration)
+
+    async def event_stream():
+        try:
+            async for event in rag_service.stream_rag_query(
+                question=query.question,
+                limit=query.limit,
+                similarity_threshold=query.similarity_threshold,
+                ef_search=query.ef_search,
+                filters=query.filters(),
+            ):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except UpstreamBusyException as e:
+            detail = {"detail": e.message, "retry_after": e.retry_after}
+            yield f"event: error\ndata: {json.dumps(detail)}\n\n"
+        except Exception as e:
+            logger.error(f"Error in streaming RAG query: {e}")
+            detail = {"detail": "Error interno del servidor en consulta RAG"}
+            yield f"event: error\ndata: {json.dumps(detail)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
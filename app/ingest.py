@@ -0,0 +1,64 @@
+"""Bulk corpus ingestion.
+
+Usage: python -m app.ingest <directory> [--pattern "*.txt"] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List
+
+from app.config.settings import get_ingestion_service, ingestion_config
+
+logger = logging.getLogger(__name__)
+
+
+async def read_files(paths: List[Path]) -> AsyncGenerator[Dict[str, Any], None]:
+    """Read files one at a time so only in-flight documents are held in memory"""
+    for path in paths:
+        content_bytes = await asyncio.to_thread(path.read_bytes)
+        yield {
+            "filename": path.name,
+            "content": content_bytes.decode("utf-8", errors="ignore"),
+            "file_size": len(content_bytes),
+        }
+
+
+async def ingest_directory(
+    directory: Path, pattern: str, concurrency: int, write_batch_size: int
+) -> Dict[str, Any]:
+    paths = sorted(path for path in directory.rglob(pattern) if path.is_file())
+    logger.info(f"Found {len(paths)} files in {directory}")
+
+    ingestion_service = get_ingestion_service()
+    return await ingestion_service.ingest_many(
+        read_files(paths), concurrency=concurrency, write_batch_size=write_batch_size
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk ingest a directory of documents")
+    parser.add_argument("directory", type=Path, help="Directory containing the corpus")
+    parser.add_argument("--pattern", default="*.txt", help="Glob pattern for files to ingest")
+    parser.add_argument("--concurrency", type=int, default=ingestion_config.bulk_concurrency)
+    parser.add_argument(
+        "--write-batch-size", type=int, default=ingestion_config.bulk_write_batch_size
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    if not args.directory.is_dir():
+        parser.error(f"{args.directory} is not a directory")
+
+    stats = asyncio.run(
+        ingest_directory(args.directory, args.pattern, args.concurrency, args.write_batch_size)
+    )
+    print(json.dumps({key: value for key, value in stats.items() if key != "document_ids"}))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,25 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.api.routes.documents import router as document_router
 from app.api.routes.search import router as search_router
-
-from .config.settings import app_config, get_db_service, get_embedding_service
+from app.utils.metrics import ServerTimingMiddleware, registry
+
+from .config.settings import (
+    app_config,
+    close_resources,
+    get_db_service,
+    get_embedding_batcher,
+    get_embedding_cache,
+    get_embedding_migration,
+    get_embedding_service,
+    get_health_monitor,
+    get_job_queue,
+    get_rate_limiter,
+    get_vector_index,
+)
 
 logging.basicConfig(
     level=getattr(logging, app_config.log_level),
@@ -23,17 +37,33 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting RAG API...")
 
-    # Test database connection
+    # Create the shared services and test their connections
     db_service = get_db_service()
-    if not db_service.test_connection():
+    if not await db_service.test_connection():
         logger.error("Database connection failed")
         raise Exception("Cannot connect to database")
 
-    # Test OpenAI connection
+    # Test the embedding backend (OpenAI or local)
     embedding_service = get_embedding_service()
     if not await embedding_service.test_connection():
-        logger.error("OpenAI connection failed")
-        raise Exception("Cannot connect to OpenAI")
+        logger.error("Embedding backend connection failed")
+        raise Exception("Cannot reach the embedding backend")
+
+    # Keep dependency status fresh in the background for the readiness endpoints
+    await get_health_monitor().start()
+
+    # Background workers for queued uploads
+    await get_job_queue().start()
+
+    # Load and sync the in-process vector snapshot, if that backend is enabled
+    vector_index = get_vector_index()
+    if vector_index is not None:
+        await vector_index.start()
+
+    # Backfill the target embedding space when moving to a new model
+    migration = get_embedding_migration()
+    if migration is not None:
+        await migration.start()
 
     logger.info("RAG API started successfully")
 
@@ -41,6 +71,7 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     logger.info("Shutting down RAG API...")
+    await close_resources()
 
 
 app = FastAPI(
@@ -56,27 +87,104 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(document_router, prefix="/documents", tags=["Documents"])
 app.include_router(search_router, prefix="/search", tags=["Search"])
 
 
 # Health check endpoint
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is serving requests, no I/O"""
+    return {"status": "alive", "timestamp": time.time()}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe from the background checks; 503 while a dependency is down"""
+    snapshot = get_health_monitor().snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    db_service = get_db_service()
-    embedding_service = get_embedding_service()
+    """Health check endpoint, served from the last background checks"""
+    monitor = get_health_monitor()
+    return {
+        "status": "healthy" if monitor.is_ready() else "degraded",
+        "database_connected": monitor.is_ok("database"),
+        "openai_connected": monitor.is_ok("embeddings"),
+        "checks": monitor.snapshot()["checks"],
+        "timestamp": time.time(),
+    }
+
 
+@app.get("/stats")
+async def stats():
+    """Runtime statistics"""
     return {
-        "status": "healthy",
-        "database_connected": db_service.test_connection(),
-        "openai_connected": await embedding_service.test_connection(),
+        "db_pool": get_db_service().pool_stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "embedding_batcher": get_embedding_batcher().stats(),
+        "ingestion_jobs": get_job_queue().stats(),
+        "openai_limiter": get_rate_limiter().stats(),
+        "vector_index": get_vector_index().stats() if get_vector_index() else None,
+        "embedding_migration": (
+            get_embedding_migration().stats() if get_embedding_migration() else None
+        ),
         "timestamp": time.time(),
     }
 
 
+def collect_runtime_gauges():
+    """Pool usage and cache effectiveness, read when /metrics is scraped"""
+    pool = get_db_service().pool_stats()
+    cache = get_embedding_cache().stats()
+    batcher = get_embedding_batcher().stats()
+    limiter = get_rate_limiter().stats()
+    return [
+        ("rag_db_pool_checked_out", "Connections checked out of the pool", pool["checked_out"]),
+        ("rag_db_pool_overflow", "Overflow connections in use", pool["overflow"]),
+        (
+            "rag_embedding_cache_hit_ratio",
+            "Embedding cache hits over lookups",
+            cache["hit_ratio"],
+        ),
+        (
+            "rag_embedding_cache_hits",
+            "Embedding cache hits (memory and persistent)",
+            cache["memory_hits"] + cache["persistent_hits"],
+        ),
+        ("rag_embedding_cache_misses", "Embedding cache misses", cache["misses"]),
+        ("rag_embedding_cache_size", "Entries in the in-memory embedding cache", cache["size"]),
+        (
+            "rag_embedding_batch_size_avg",
+            "Average texts per embedding provider call",
+            batcher["avg_batch_size"],
+        ),
+        ("rag_embedding_inflight", "Embedding texts queued or in flight", batcher["inflight"]),
+        (
+            "rag_openai_concurrency_limit",
+            "Adaptive limit on in-flight OpenAI requests",
+            limiter["concurrency_limit"],
+        ),
+        ("rag_openai_inflight", "OpenAI requests in flight", limiter["inflight"]),
+        ("rag_openai_waiting", "OpenAI requests waiting for admission", limiter["waiting"]),
+    ]
+
+
+registry.register_gauges(collect_runtime_gauges)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
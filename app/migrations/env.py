@@ -53,6 +53,9 @@ def process_revision_directives(context, revision, directives):
 # 3. Include Vector in type comparison
 def include_object(object, name, type_, reflected, compare_to):
     """Include Vector types in comparison."""
+    # Per-space HNSW indexes are created at runtime by the embedding migration
+    if type_ == "index" and reflected and name.startswith("idx_chunk_embeddings_space_"):
+        return False
     return True
 
 
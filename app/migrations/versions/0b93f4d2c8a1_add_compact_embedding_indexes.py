@@ -0,0 +1,48 @@
+"""add compact embedding indexes
+
+Revision ID: 0b93f4d2c8a1
+Revises: f81c6a2e5d04
+Create Date: 2026-10-18 16:20:37.448102
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+VECTOR_DIMENSION = int(os.getenv('VECTOR_DIMENSION', '1536'))
+
+# revision identifiers, used by Alembic.
+revision: str = '0b93f4d2c8a1'
+down_revision: Union[str, Sequence[str], None] = 'f81c6a2e5d04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Expression indexes over the full-precision column: half precision (2x smaller)
+    # and binary quantization (32x smaller). Queries use them for a coarse candidate
+    # search and re-rank candidates against the full vectors (VECTOR_STORAGE setting).
+    # Once a compact mode is in use, idx_latam_doc_chunks_embedding_hnsw can be
+    # dropped to reclaim its memory.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_latam_doc_chunks_embedding_halfvec_hnsw "
+            f"ON latam_doc_chunks USING hnsw ((embedding::halfvec({VECTOR_DIMENSION})) halfvec_cosine_ops) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_latam_doc_chunks_embedding_bit_hnsw "
+            f"ON latam_doc_chunks USING hnsw ((binary_quantize(embedding)::bit({VECTOR_DIMENSION})) bit_hamming_ops) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_latam_doc_chunks_embedding_bit_hnsw")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_latam_doc_chunks_embedding_halfvec_hnsw")
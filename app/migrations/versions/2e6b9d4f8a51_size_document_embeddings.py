@@ -0,0 +1,36 @@
+"""size document embeddings
+
+Revision ID: 2e6b9d4f8a51
+Revises: 7a3f5c9e2b18
+Create Date: 2026-10-18 23:48:06.274915
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+VECTOR_DIMENSION = int(os.getenv('VECTOR_DIMENSION', '1536'))
+
+# revision identifiers, used by Alembic.
+revision: str = '2e6b9d4f8a51'
+down_revision: Union[str, Sequence[str], None] = '7a3f5c9e2b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The baseline revision creates latam_docs.embedding as vector(1536); databases
+    # set up for another dimension resize it here. Stored vectors of another size
+    # make this fail: the documents have to be re-embedded first.
+    if VECTOR_DIMENSION != 1536:
+        op.alter_column('latam_docs', 'embedding', type_=pgvector.sqlalchemy.Vector(dim=VECTOR_DIMENSION), existing_type=pgvector.sqlalchemy.Vector(dim=1536), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if VECTOR_DIMENSION != 1536:
+        op.alter_column('latam_docs', 'embedding', type_=pgvector.sqlalchemy.Vector(dim=1536), existing_type=pgvector.sqlalchemy.Vector(dim=VECTOR_DIMENSION), existing_nullable=False)
@@ -0,0 +1,50 @@
+"""add latam doc chunks
+
+Revision ID: 3f1a9c2d7b4e
+Revises: 8de396cf267b
+Create Date: 2026-10-18 09:12:04.518223
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+VECTOR_DIMENSION = int(os.getenv('VECTOR_DIMENSION', '1536'))
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c2d7b4e'
+down_revision: Union[str, Sequence[str], None] = '8de396cf267b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('latam_doc_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('token_count', sa.Integer(), nullable=True),
+    sa.Column('embedding', pgvector.sqlalchemy.Vector(dim=VECTOR_DIMENSION), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['latam_docs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('document_id', 'chunk_index', name='uq_chunk_document_index')
+    )
+    op.create_index('idx_chunk_document_id', 'latam_doc_chunks', ['document_id'], unique=False)
+
+    # Existing documents become a single chunk so they stay searchable until re-uploaded
+    op.execute(
+        "INSERT INTO latam_doc_chunks (document_id, chunk_index, content, embedding, created_at) "
+        "SELECT id, 0, content, embedding, created_at FROM latam_docs"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_chunk_document_id', table_name='latam_doc_chunks')
+    op.drop_table('latam_doc_chunks')
@@ -0,0 +1,49 @@
+"""add content hashes
+
+Revision ID: 4b8d2f6a1c93
+Revises: 9c4e1f7a2d35
+Create Date: 2026-10-18 21:05:12.903417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8d2f6a1c93'
+down_revision: Union[str, Sequence[str], None] = '9c4e1f7a2d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('latam_docs', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('latam_doc_chunks', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    # Same digest as IngestionService.content_hash: hex SHA-256 of the UTF-8 text
+    op.execute("UPDATE latam_docs SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')")
+    op.execute("UPDATE latam_doc_chunks SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_latam_doc_chunks_content_hash',
+            'latam_doc_chunks',
+            ['content_hash'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_latam_doc_chunks_content_hash',
+            table_name='latam_doc_chunks',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('latam_doc_chunks', 'content_hash')
+    op.drop_column('latam_docs', 'content_hash')
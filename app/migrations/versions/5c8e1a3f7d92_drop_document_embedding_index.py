@@ -0,0 +1,37 @@
+"""drop document embedding index
+
+Revision ID: 5c8e1a3f7d92
+Revises: 2e6b9d4f8a51
+Create Date: 2026-10-19 09:14:27.630184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e1a3f7d92'
+down_revision: Union[str, Sequence[str], None] = '2e6b9d4f8a51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases migrated before a7c4e19b2f60 stopped creating it still have the
+    # latam_docs HNSW index; no query searches document embeddings
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_latam_docs_embedding_hnsw',
+            table_name='latam_docs',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nothing to restore: the index is no longer part of the schema
+    pass
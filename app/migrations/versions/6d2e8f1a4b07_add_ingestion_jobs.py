@@ -0,0 +1,50 @@
+"""add ingestion jobs
+
+Revision ID: 6d2e8f1a4b07
+Revises: 0b93f4d2c8a1
+Create Date: 2026-10-18 17:05:12.730418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2e8f1a4b07'
+down_revision: Union[str, Sequence[str], None] = '0b93f4d2c8a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingestion_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('file_size', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('stage', sa.String(length=50), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('chunk_count', sa.Integer(), nullable=True),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['document_id'], ['latam_docs.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_ingestion_jobs_pending', 'ingestion_jobs', ['status', 'run_after'], unique=False, postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_ingestion_jobs_pending', table_name='ingestion_jobs', postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_table('ingestion_jobs')
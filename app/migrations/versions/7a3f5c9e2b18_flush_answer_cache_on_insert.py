@@ -0,0 +1,47 @@
+"""flush answer cache on insert
+
+Revision ID: 7a3f5c9e2b18
+Revises: 4b8d2f6a1c93
+Create Date: 2026-10-18 23:12:40.518263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3f5c9e2b18'
+down_revision: Union[str, Sequence[str], None] = '4b8d2f6a1c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A new document can answer any cached question, including the ones cached
+    # as "no information": drop the whole cache once per inserting statement
+    op.execute(
+        """
+        CREATE FUNCTION flush_answer_cache() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM answer_cache;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER trg_latam_docs_flush_answer_cache
+        AFTER INSERT ON latam_docs
+        FOR EACH STATEMENT EXECUTE FUNCTION flush_answer_cache()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_latam_docs_flush_answer_cache ON latam_docs")
+    op.execute("DROP FUNCTION IF EXISTS flush_answer_cache()")
@@ -0,0 +1,63 @@
+"""add embedding spaces
+
+Revision ID: 9c4e1f7a2d35
+Revises: 6d2e8f1a4b07
+Create Date: 2026-10-18 19:42:37.118052
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+VECTOR_DIMENSION = int(os.getenv('VECTOR_DIMENSION', '1536'))
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1f7a2d35'
+down_revision: Union[str, Sequence[str], None] = '6d2e8f1a4b07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('embedding_spaces',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=150), nullable=False),
+    sa.Column('backend', sa.String(length=20), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('dimension', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('backfilled_through', sa.Integer(), nullable=False),
+    sa.Column('embedded_count', sa.Integer(), nullable=False),
+    sa.Column('lease_owner', sa.String(length=100), nullable=True),
+    sa.Column('leased_until', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('ready_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('chunk_embeddings',
+    sa.Column('space_id', sa.Integer(), nullable=False),
+    sa.Column('chunk_id', sa.Integer(), nullable=False),
+    sa.Column('embedding', pgvector.sqlalchemy.Vector(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['chunk_id'], ['latam_doc_chunks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['space_id'], ['embedding_spaces.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('space_id', 'chunk_id')
+    )
+    op.create_index('idx_chunk_embeddings_chunk_id', 'chunk_embeddings', ['chunk_id'], unique=False)
+    # Cached vectors of any model and dimension share the table
+    op.alter_column('embedding_cache', 'embedding', type_=pgvector.sqlalchemy.Vector(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"DELETE FROM embedding_cache WHERE vector_dims(embedding) <> {VECTOR_DIMENSION}")
+    op.alter_column('embedding_cache', 'embedding', type_=pgvector.sqlalchemy.Vector(dim=VECTOR_DIMENSION), existing_nullable=False)
+    op.drop_index('idx_chunk_embeddings_chunk_id', table_name='chunk_embeddings')
+    op.drop_table('chunk_embeddings')
+    op.drop_table('embedding_spaces')
@@ -0,0 +1,48 @@
+"""add hnsw embedding indexes
+
+Revision ID: a7c4e19b2f60
+Revises: 3f1a9c2d7b4e
+Create Date: 2026-10-18 10:03:41.207915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e19b2f60'
+down_revision: Union[str, Sequence[str], None] = '3f1a9c2d7b4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HNSW_PARAMS = {'m': 16, 'ef_construction': 64}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_latam_doc_chunks_embedding_hnsw',
+            'latam_doc_chunks',
+            ['embedding'],
+            unique=False,
+            postgresql_using='hnsw',
+            postgresql_with=HNSW_PARAMS,
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_latam_doc_chunks_embedding_hnsw',
+            table_name='latam_doc_chunks',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,39 @@
+"""add embedding cache
+
+Revision ID: c2d85e3a91f7
+Revises: a7c4e19b2f60
+Create Date: 2026-10-18 11:26:15.730164
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+VECTOR_DIMENSION = int(os.getenv('VECTOR_DIMENSION', '1536'))
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d85e3a91f7'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e19b2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('embedding_cache',
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('text_hash', sa.String(length=64), nullable=False),
+    sa.Column('embedding', pgvector.sqlalchemy.Vector(dim=VECTOR_DIMENSION), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('model', 'text_hash')
+    )
+    op.create_index('idx_embedding_cache_created_at', 'embedding_cache', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_embedding_cache_created_at', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
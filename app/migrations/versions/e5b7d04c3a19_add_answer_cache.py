@@ -0,0 +1,68 @@
+"""add answer cache
+
+Revision ID: e5b7d04c3a19
+Revises: c2d85e3a91f7
+Create Date: 2026-10-18 13:47:22.091836
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+VECTOR_DIMENSION = int(os.getenv('VECTOR_DIMENSION', '1536'))
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7d04c3a19'
+down_revision: Union[str, Sequence[str], None] = 'c2d85e3a91f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('answer_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('embedding', pgvector.sqlalchemy.Vector(dim=VECTOR_DIMENSION), nullable=False),
+    sa.Column('response', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('source_document_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_answer_cache_created_at', 'answer_cache', ['created_at'], unique=False)
+    op.create_index('idx_answer_cache_source_ids', 'answer_cache', ['source_document_ids'], unique=False, postgresql_using='gin')
+    op.create_index('idx_answer_cache_embedding_hnsw', 'answer_cache', ['embedding'], unique=False, postgresql_using='hnsw', postgresql_with={'m': 16, 'ef_construction': 64}, postgresql_ops={'embedding': 'vector_cosine_ops'})
+
+    # Drop cached answers whenever one of their source documents changes,
+    # whatever code path (or manual SQL) makes the change
+    op.execute(
+        """
+        CREATE FUNCTION invalidate_answer_cache() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM answer_cache WHERE source_document_ids @> ARRAY[OLD.id];
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER trg_latam_docs_invalidate_answer_cache
+        AFTER UPDATE OR DELETE ON latam_docs
+        FOR EACH ROW EXECUTE FUNCTION invalidate_answer_cache()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_latam_docs_invalidate_answer_cache ON latam_docs")
+    op.execute("DROP FUNCTION IF EXISTS invalidate_answer_cache()")
+    op.drop_index('idx_answer_cache_embedding_hnsw', table_name='answer_cache')
+    op.drop_index('idx_answer_cache_source_ids', table_name='answer_cache')
+    op.drop_index('idx_answer_cache_created_at', table_name='answer_cache')
+    op.drop_table('answer_cache')
@@ -0,0 +1,46 @@
+"""add chunk tsvector
+
+Revision ID: f81c6a2e5d04
+Revises: e5b7d04c3a19
+Create Date: 2026-10-18 15:02:56.614470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81c6a2e5d04'
+down_revision: Union[str, Sequence[str], None] = 'e5b7d04c3a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('latam_doc_chunks', sa.Column('content_tsv', postgresql.TSVECTOR(), sa.Computed("to_tsvector('spanish'::regconfig, content)", persisted=True), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_latam_doc_chunks_content_tsv',
+            'latam_doc_chunks',
+            ['content_tsv'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_latam_doc_chunks_content_tsv',
+            table_name='latam_doc_chunks',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('latam_doc_chunks', 'content_tsv')
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Index, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+from app.config.settings import VECTOR_DIMENSION
+from app.models.base import Base
+
+
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+
+    # Primary key
+    id = Column(Integer, primary_key=True)
+
+    # Question and its embedding, used for similarity lookups
+    question = Column(Text, nullable=False)
+    embedding = Column(Vector(VECTOR_DIMENSION), nullable=False)  # pgvector column
+
+    # Cached RAG result (answer, context_used, sources)
+    response = Column(JSONB, nullable=False)
+
+    # Documents the answer was generated from; changes to any of them invalidate it
+    source_document_ids = Column(ARRAY(Integer), nullable=False, default=list)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index(
+            "idx_answer_cache_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+        Index("idx_answer_cache_source_ids", "source_document_ids", postgresql_using="gin"),
+        Index("idx_answer_cache_created_at", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<AnswerCacheEntry(id={self.id}, question='{self.question[:30]}')>"
@@ -2,8 +2,22 @@ from datetime import datetime
 from typing import Any, Dict
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy import (
+    Column,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    text,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship
 
+from app.config.settings import VECTOR_DIMENSION
 from app.models.base import Base
 
 
@@ -16,9 +30,11 @@ class LatamDoc(Base):
     # Document metadata
     filename = Column(String(255), nullable=False, index=True)
     content = Column(Text, nullable=False)
+    # SHA-256 of content; re-uploads with the same hash are skipped
+    content_hash = Column(String(64), nullable=True)
 
     # Vector embedding for semantic search
-    embedding = Column(Vector(1536), nullable=False)  # pgvector column
+    embedding = Column(Vector(VECTOR_DIMENSION), nullable=False)  # pgvector column
 
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -29,6 +45,14 @@ class LatamDoc(Base):
     content_length = Column(Integer, nullable=True)
     document_type = Column(String(50), nullable=True, default="text")
 
+    chunks = relationship(
+        "LatamDocChunk",
+        back_populates="document",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="LatamDocChunk.chunk_index",
+    )
+
     # Indexes for performance
     __table_args__ = (
         Index("idx_filename", "filename"),
@@ -45,9 +69,77 @@ class LatamDoc(Base):
             "id": self.id,
             "filename": self.filename,
             "content": self.content,
+            "content_hash": self.content_hash,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "file_size": self.file_size,
             "content_length": self.content_length,
             "document_type": self.document_type,
         }
+
+
+class LatamDocChunk(Base):
+    __tablename__ = "latam_doc_chunks"
+
+    # Primary key
+    id = Column(Integer, primary_key=True)
+
+    # Parent document
+    document_id = Column(Integer, ForeignKey("latam_docs.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+
+    # Chunk content and its embedding
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of content, for embedding reuse
+    token_count = Column(Integer, nullable=True)
+    embedding = Column(Vector(VECTOR_DIMENSION), nullable=False)  # pgvector column
+
+    # Spanish full-text vector for lexical matching, maintained by Postgres
+    content_tsv = Column(
+        TSVECTOR, Computed("to_tsvector('spanish'::regconfig, content)", persisted=True)
+    )
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    document = relationship("LatamDoc", back_populates="chunks")
+
+    __table_args__ = (
+        Index("idx_chunk_document_id", "document_id"),
+        Index(
+            "idx_latam_doc_chunks_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+        # Compact expression indexes for the halfvec and binary VECTOR_STORAGE modes
+        Index(
+            "idx_latam_doc_chunks_embedding_halfvec_hnsw",
+            text(f"(embedding::halfvec({VECTOR_DIMENSION})) halfvec_cosine_ops"),
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+        ),
+        Index(
+            "idx_latam_doc_chunks_embedding_bit_hnsw",
+            text(f"(binary_quantize(embedding)::bit({VECTOR_DIMENSION})) bit_hamming_ops"),
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+        ),
+        Index("idx_latam_doc_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+        Index("idx_latam_doc_chunks_content_hash", "content_hash"),
+        UniqueConstraint("document_id", "chunk_index", name="uq_chunk_document_index"),
+    )
+
+    def __repr__(self):
+        return f"<LatamDocChunk(id={self.id}, document_id={self.document_id}, index={self.chunk_index})>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert model to dictionary"""
+        return {
+            "id": self.id,
+            "document_id": self.document_id,
+            "chunk_index": self.chunk_index,
+            "content": self.content,
+            "token_count": self.token_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
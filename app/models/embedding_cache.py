@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, Index, String
+
+from app.models.base import Base
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # Cache key: embedding model plus hash of the normalized text
+    model = Column(String(100), primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+
+    # Dimensionless so every embedding space can share the cache
+    embedding = Column(Vector(), nullable=False)  # pgvector column
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("idx_embedding_cache_created_at", "created_at"),)
+
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry(model='{self.model}', text_hash='{self.text_hash}')>"
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+
+from app.models.base import Base
+
+
+class EmbeddingSpace(Base):
+    """A model + dimension whose chunk vectors live in chunk_embeddings.
+
+    The embedding column of latam_doc_chunks stays the primary space; extra
+    spaces are filled by the background backfill so a new model can be
+    adopted without rewriting that column or blocking ingestion.
+    """
+
+    __tablename__ = "embedding_spaces"
+
+    # Primary key
+    id = Column(Integer, primary_key=True)
+
+    # Backend vector-space name (model plus dimension), unique per space
+    name = Column(String(150), nullable=False, unique=True)
+    backend = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    dimension = Column(Integer, nullable=False)
+
+    # backfilling -> indexing -> ready
+    status = Column(String(20), nullable=False, default="backfilling")
+    # Checkpoint: every chunk with a lower or equal id has been visited
+    backfilled_through = Column(Integer, nullable=False, default=0)
+    embedded_count = Column(Integer, nullable=False, default=0)
+
+    # Lease of the process currently running the backfill
+    lease_owner = Column(String(100), nullable=True)
+    leased_until = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    ready_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<EmbeddingSpace(id={self.id}, name='{self.name}', status='{self.status}')>"
+
+    @property
+    def index_name(self) -> str:
+        """Partial HNSW index over this space's rows of chunk_embeddings"""
+        return f"idx_chunk_embeddings_space_{self.id}_hnsw"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert model to dictionary"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "backend": self.backend,
+            "model": self.model,
+            "dimension": self.dimension,
+            "status": self.status,
+            "backfilled_through": self.backfilled_through,
+            "embedded_count": self.embedded_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "ready_at": self.ready_at.isoformat() if self.ready_at else None,
+        }
+
+
+class ChunkEmbedding(Base):
+    __tablename__ = "chunk_embeddings"
+
+    space_id = Column(
+        Integer, ForeignKey("embedding_spaces.id", ondelete="CASCADE"), primary_key=True
+    )
+    chunk_id = Column(
+        Integer, ForeignKey("latam_doc_chunks.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    # Dimensionless column: each space indexes `embedding::vector(dimension)` on its own rows
+    embedding = Column(Vector(), nullable=False)  # pgvector column
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("idx_chunk_embeddings_chunk_id", "chunk_id"),)
+
+    def __repr__(self):
+        return f"<ChunkEmbedding(space_id={self.space_id}, chunk_id={self.chunk_id})>"
@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, text
+
+from app.models.base import Base
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    # Primary key
+    id = Column(Integer, primary_key=True)
+
+    # Uploaded file; content is cleared once the document is stored
+    filename = Column(String(255), nullable=False)
+    content = Column(Text, nullable=True)
+    file_size = Column(Integer, nullable=True)
+
+    # queued -> running -> succeeded | failed (running jobs go back to queued on retry)
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    progress = Column(Float, nullable=False, default=0.0)
+    stage = Column(String(50), nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Result
+    document_id = Column(Integer, ForeignKey("latam_docs.id", ondelete="SET NULL"), nullable=True)
+    chunk_count = Column(Integer, nullable=True)
+
+    # Scheduling: not picked up before run_after; locked_at marks the current claim
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers only ever scan pending jobs, so keep the index to those
+        Index(
+            "idx_ingestion_jobs_pending",
+            "status",
+            "run_after",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, filename='{self.filename}', status='{self.status}')>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert model to dictionary"""
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "file_size": self.file_size,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "progress": self.progress,
+            "stage": self.stage,
+            "error": self.error,
+            "document_id": self.document_id,
+            "chunk_count": self.chunk_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -12,12 +12,103 @@ class DocumentType(str, Enum):
     TXT = "txt"
 
 
-class QueryRequest(BaseModel):
-    question: str = Field(..., min_length=1, max_length=1000, description="Question to search")
+# Questions accepted by one /search/batch request
+MAX_BATCH_QUESTIONS = 500
+
+
+class SearchOptions(BaseModel):
+    """Retrieval parameters shared by the single and batch query requests"""
+
     limit: Optional[int] = Field(10, ge=1, le=100, description="Maximum number of results")
     similarity_threshold: Optional[float] = Field(
         0.0, ge=0.0, le=1.0, description="Minimum similarity threshold"
     )
+    ef_search: Optional[int] = Field(
+        None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"
+    )
+    document_type: Optional[DocumentType] = Field(None, description="Only search this type")
+    created_after: Optional[datetime] = Field(None, description="Only documents created after")
+    created_before: Optional[datetime] = Field(None, description="Only documents created before")
+    include_context: bool = Field(
+        True, description="Return the full text of the chunks used as context"
+    )
+
+    def filters(self) -> Dict[str, Any]:
+        """Metadata filters to apply in the search query"""
+        filters = {
+            "document_type": self.document_type.value if self.document_type else None,
+            "created_after": self.created_after,
+            "created_before": self.created_before,
+        }
+        return {key: value for key, value in filters.items() if value is not None}
+
+
+class QueryRequest(SearchOptions):
+    question: str = Field(..., min_length=1, max_length=1000, description="Question to search")
+
+
+class BatchQueryRequest(SearchOptions):
+    questions: List[str] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_QUESTIONS, description="Questions to search"
+    )
+    generate: bool = Field(
+        False, description="Also generate an answer per question (slower, uses the chat model)"
+    )
+
+    @field_validator("questions")
+    @classmethod
+    def check_questions(cls, questions: List[str]) -> List[str]:
+        for question in questions:
+            if not question.strip():
+                raise ValueError("Las preguntas no pueden estar vacías")
+            if len(question) > 1000:
+                raise ValueError("Cada pregunta admite como máximo 1000 caracteres")
+        return questions
+
+
+class BatchQueryResult(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    context_used: Optional[List[str]] = None
+    sources: List[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+    total_questions: int
+    processing_time_ms: float
+    similarity_threshold_used: Optional[float] = None
+
+
+class SearchHitsRequest(QueryRequest):
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page")
+
+
+class SearchHit(BaseModel):
+    chunk_id: int
+    document_id: int
+    chunk_index: int
+    filename: str
+    document_type: Optional[str] = None
+    similarity: float
+    snippet: str
+
+
+class SearchHitsResponse(BaseModel):
+    query: str
+    hits: List[SearchHit]
+    next_cursor: Optional[str] = None
+    processing_time_ms: float
+
+
+class ChunkResponse(BaseModel):
+    id: int
+    document_id: int
+    chunk_index: int
+    content: str
+    token_count: Optional[int] = None
+    created_at: datetime
 
 
 class DocumentResponse(BaseModel):
@@ -45,4 +136,45 @@ class UploadResponse(BaseModel):
     document_id: int
     processing_time_ms: float
     content_length: Optional[int] = None
+    chunk_count: Optional[int] = None
+    embedded_chunks: Optional[int] = None
+    status: Optional[str] = None
     document_type: str = DocumentType.TEXT
+
+
+class UploadJobResponse(BaseModel):
+    message: str
+    job_id: int
+    filename: str
+    status: str
+    status_url: str
+
+
+class JobStatusResponse(BaseModel):
+    id: int
+    filename: str
+    file_size: Optional[int] = None
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: float
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    document_id: Optional[int] = None
+    chunk_count: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class BulkUploadResponse(BaseModel):
+    message: str
+    documents: int
+    updated: int = 0
+    unchanged: int = 0
+    chunks: int
+    embedded_chunks: int = 0
+    document_ids: List[int]
+    failed: List[Dict[str, Any]] = []
+    processing_time_ms: float
+    docs_per_second: float
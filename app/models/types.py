@@ -0,0 +1,52 @@
+from typing import List, Sequence, Union
+
+import numpy as np
+from sqlalchemy import bindparam
+from sqlalchemy.sql.elements import BindParameter
+from sqlalchemy.types import UserDefinedType
+
+
+class BinaryVector(UserDefinedType):
+    """pgvector bind type that hands NumPy arrays straight to the driver.
+
+    pgvector's Vector type renders values as '[x,y,...]' text that Postgres has to
+    parse on every query. With the pgvector psycopg adapters registered on the
+    connection (see app.config.settings), a float32 array is sent in pgvector's
+    binary format instead.
+    """
+
+    cache_ok = True
+
+    def __init__(self, dim=None):
+        super().__init__()
+        self.dim = dim
+
+    def get_col_spec(self, **kw):
+        if self.dim is None:
+            return "VECTOR"
+        return "VECTOR(%d)" % self.dim
+
+    def bind_processor(self, dialect):
+        return None
+
+
+def vector_param(
+    name: str, embedding: Union[Sequence[float], np.ndarray, List[float]]
+) -> BindParameter:
+    """Bind an embedding as a binary pgvector parameter"""
+    return bindparam(name, value=np.asarray(embedding, dtype=np.float32), type_=BinaryVector())
+
+
+class HalfVector(UserDefinedType):
+    """pgvector halfvec (16-bit floats), used for compact index expressions"""
+
+    cache_ok = True
+
+    def __init__(self, dim=None):
+        super().__init__()
+        self.dim = dim
+
+    def get_col_spec(self, **kw):
+        if self.dim is None:
+            return "HALFVEC"
+        return "HALFVEC(%d)" % self.dim
@@ -0,0 +1,61 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.answer_cache import AnswerCacheEntry
+from app.models.types import vector_param
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCacheRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def find_similar(
+        self, query_embedding: List[float], min_similarity: float, max_age_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached response closest to the query, if it is similar and fresh enough"""
+        distance = AnswerCacheEntry.embedding.cosine_distance(
+            vector_param("query_embedding", query_embedding)
+        )
+
+        query = (
+            select(AnswerCacheEntry.id, AnswerCacheEntry.response, distance.label("distance"))
+            .where(
+                AnswerCacheEntry.created_at
+                >= datetime.utcnow() - timedelta(seconds=max_age_seconds)
+            )
+            .order_by(distance)
+            .limit(1)
+        )
+        row = (await self.session.execute(query)).first()
+        if row is None or 1 - float(row.distance) < min_similarity:
+            return None
+
+        return {"id": row.id, "response": row.response, "similarity": 1 - float(row.distance)}
+
+    async def store(
+        self,
+        question: str,
+        query_embedding: List[float],
+        response: Dict[str, Any],
+        source_document_ids: List[int],
+    ) -> None:
+        try:
+            self.session.add(
+                AnswerCacheEntry(
+                    question=question,
+                    embedding=query_embedding,
+                    response=response,
+                    source_document_ids=sorted(set(source_document_ids)),
+                )
+            )
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Error storing cached answer: {e}")
+            raise
@@ -1,83 +1,914 @@
-import json
 import logging
-from typing import List, Optional, Tuple
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+import numpy as np
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import func, literal, select, text
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Float,
+    Integer,
+    Text,
+    and_,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    true,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.sql import Select
 
-from app.models.document import LatamDoc
+from app.models.document import LatamDoc, LatamDocChunk
+from app.models.embedding_space import ChunkEmbedding, EmbeddingSpace
+from app.models.types import BinaryVector, HalfVector, vector_param
 
 logger = logging.getLogger(__name__)
 
+# Must match the configuration used by the latam_doc_chunks.content_tsv column
+TEXT_SEARCH_CONFIG = literal_column("'spanish'::regconfig")
+
+# ts_headline options for search snippets: a couple of short fragments around the matches
+SNIPPET_OPTIONS = "MaxFragments=2, MaxWords=30, MinWords=12, StartSel=<mark>, StopSel=</mark>"
+
 
 class DocumentRepository:
     def __init__(self, session: Session):
         self.session = session
 
     async def create_document(
-        self, filename: str, content: str, embedding: List[float]
+        self,
+        filename: str,
+        content: str,
+        embedding: List[float],
+        chunks: Optional[List[Dict[str, Any]]] = None,
+        file_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
     ) -> LatamDoc:
         try:
-            doc = LatamDoc(filename=filename, content=content, embedding=embedding)
+            doc = LatamDoc(
+                filename=filename,
+                content=content,
+                content_hash=content_hash,
+                embedding=embedding,
+                file_size=file_size,
+                content_length=len(content),
+            )
+            doc.chunks = [
+                LatamDocChunk(
+                    chunk_index=chunk["chunk_index"],
+                    content=chunk["content"],
+                    content_hash=chunk.get("content_hash"),
+                    token_count=chunk.get("token_count"),
+                    embedding=chunk["embedding"],
+                )
+                for chunk in chunks or []
+            ]
             self.session.add(doc)
             await self.session.commit()
             await self.session.refresh(doc)
-            logger.info(f"Created document: {doc.id} - {filename}")
+            logger.info(f"Created document: {doc.id} - {filename} ({len(chunks or [])} chunks)")
             return doc
         except Exception as e:
-            self.session.rollback()
+            await self.session.rollback()
             logger.error(f"Error creating document: {e}")
             raise
 
-    async def semantic_search(self, query_embedding: List[float], limit: int = 3) -> List[dict]:
+    async def upsert_document(
+        self,
+        filename: str,
+        content: str,
+        embedding: List[float],
+        chunks: List[Dict[str, Any]],
+        file_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
+    ) -> Tuple[LatamDoc, str]:
+        """Create the document, or update the one stored under the same filename.
+
+        Returns the document and whether it was "created", "updated" or left
+        "unchanged" because the stored content has the same hash.
+        """
         try:
+            await self.lock_filenames([filename])
+            existing = (await self.get_by_filenames([filename])).get(filename)
+            if existing is None:
+                doc = await self.create_document(
+                    filename, content, embedding, chunks, file_size, content_hash
+                )
+                return doc, "created"
+
+            status = "unchanged"
+            if existing["content_hash"] != content_hash:
+                await self.update_document(
+                    existing["id"],
+                    {
+                        "content": content,
+                        "content_hash": content_hash,
+                        "embedding": embedding,
+                        "chunks": chunks,
+                        "file_size": file_size,
+                    },
+                    datetime.utcnow(),
+                )
+                status = "updated"
+            await self.session.commit()
+            doc = await self.session.get(LatamDoc, existing["id"])
+            return doc, status
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Error upserting document: {e}")
+            raise
+
+    async def bulk_upsert_documents(
+        self, documents: List[Dict[str, Any]]
+    ) -> Tuple[List[int], List[int]]:
+        """Insert or update many documents and their chunks in a single transaction.
+
+        Documents whose filename is already stored are updated in place; new
+        ones go through one multi-row INSERT ... RETURNING and their chunks are
+        streamed with binary COPY, which avoids per-row statements entirely.
+        Returns the document id of every input (in order) and the updated ids.
+        """
+        try:
+            now = datetime.utcnow()
+            # A filename repeated within the batch keeps its last version
+            latest = {doc["filename"]: doc for doc in documents}
+            await self.lock_filenames(list(latest))
+            existing = await self.get_by_filenames(list(latest))
+
+            ids_by_filename: Dict[str, int] = {}
+            updated_ids: List[int] = []
+            for filename, doc in latest.items():
+                if filename not in existing:
+                    continue
+                ids_by_filename[filename] = existing[filename]["id"]
+                if existing[filename]["content_hash"] != doc["content_hash"]:
+                    await self.update_document(existing[filename]["id"], doc, now)
+                    updated_ids.append(existing[filename]["id"])
+
+            new_documents = [doc for doc in latest.values() if doc["filename"] not in existing]
+            if new_documents:
+                result = await self.session.execute(
+                    insert(LatamDoc).returning(LatamDoc.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "filename": doc["filename"],
+                            "content": doc["content"],
+                            "content_hash": doc.get("content_hash"),
+                            "embedding": doc["embedding"],
+                            "file_size": doc.get("file_size"),
+                            "content_length": len(doc["content"]),
+                            "document_type": "text",
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                        for doc in new_documents
+                    ],
+                )
+                new_ids = [row[0] for row in result]
+                ids_by_filename.update(
+                    (doc["filename"], doc_id) for doc, doc_id in zip(new_documents, new_ids)
+                )
+                await self.copy_chunks(zip(new_ids, new_documents), now)
+
+            await self.session.commit()
+            logger.info(
+                f"Bulk upserted {len(latest)} documents "
+                f"({len(new_documents)} created, {len(updated_ids)} updated)"
+            )
+            return [ids_by_filename[doc["filename"]] for doc in documents], updated_ids
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Error bulk upserting documents: {e}")
+            raise
+
+    async def copy_chunks(self, documents, now: datetime) -> None:
+        """Stream the chunks of (document id, document) pairs with binary COPY"""
+        # pgvector adapters are registered on connect, so "vector" is a known COPY type
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+
+        async with driver_connection.cursor() as cursor:
+            async with cursor.copy(
+                "COPY latam_doc_chunks "
+                "(document_id, chunk_index, content, content_hash, token_count, embedding, "
+                "created_at) FROM STDIN WITH (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["int4", "int4", "text", "text", "int4", "vector", "timestamp"])
+                for doc_id, doc in documents:
+                    for chunk in doc["chunks"]:
+                        await copy.write_row(
+                            (
+                                doc_id,
+                                chunk["chunk_index"],
+                                chunk["content"],
+                                chunk.get("content_hash"),
+                                chunk.get("token_count"),
+                                np.asarray(chunk["embedding"], dtype=np.float32),
+                                now,
+                            )
+                        )
+
+    async def lock_filenames(self, filenames: List[str]) -> None:
+        """Serialize writers of the same filenames until the transaction ends"""
+        # Sorted so concurrent batches take overlapping locks in the same order
+        for filename in sorted(set(filenames)):
+            await self.session.execute(
+                select(func.pg_advisory_xact_lock(func.hashtextextended(filename, 0)))
+            )
+
+    async def get_by_filenames(self, filenames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Id, content hash and chunk count of the latest document stored under each filename"""
+        chunk_count = (
+            select(func.count()).where(LatamDocChunk.document_id == LatamDoc.id).scalar_subquery()
+        )
+        result = await self.session.execute(
+            select(
+                LatamDoc.filename,
+                LatamDoc.id,
+                LatamDoc.content_hash,
+                chunk_count.label("chunk_count"),
+            )
+            .where(LatamDoc.filename.in_(filenames))
+            .distinct(LatamDoc.filename)
+            .order_by(LatamDoc.filename, LatamDoc.id.desc())
+        )
+        return {row.filename: dict(row._mapping) for row in result}
+
+    async def update_document(self, doc_id: int, doc: Dict[str, Any], now: datetime) -> None:
+        """Replace a document's content, keeping the rows of chunks whose content is unchanged"""
+        await self.session.execute(
+            update(LatamDoc)
+            .where(LatamDoc.id == doc_id)
+            .values(
+                content=doc["content"],
+                content_hash=doc.get("content_hash"),
+                embedding=doc["embedding"],
+                file_size=doc.get("file_size"),
+                content_length=len(doc["content"]),
+                # Also tells the vector index snapshot to re-read the document
+                updated_at=now,
+            )
+        )
+        changes = await self.sync_chunks(doc_id, doc["chunks"], now)
+        logger.info(
+            f"Updated document {doc_id}: {changes['kept']} chunks kept, "
+            f"{changes['added']} added, {changes['removed']} removed"
+        )
+
+    async def sync_chunks(
+        self, doc_id: int, chunks: List[Dict[str, Any]], now: datetime
+    ) -> Dict[str, int]:
+        """Make a document's chunks match `chunks`, diffing by content hash.
+
+        Stored chunks whose content reappears keep their row (and id, so their
+        vectors in other embedding spaces stay valid), moving to the new
+        position if needed; the rest are deleted and new content is inserted.
+        """
+        result = await self.session.execute(
+            select(LatamDocChunk.id, LatamDocChunk.chunk_index, LatamDocChunk.content_hash)
+            .where(LatamDocChunk.document_id == doc_id)
+            .order_by(LatamDocChunk.chunk_index)
+        )
+        stored = result.all()
+        available: Dict[Optional[str], List[Any]] = {}
+        for row in stored:
+            available.setdefault(row.content_hash, []).append(row)
+
+        kept: Dict[int, int] = {}
+        moved: Dict[int, int] = {}
+        added: List[Dict[str, Any]] = []
+        for chunk in chunks:
+            rows = available.get(chunk.get("content_hash")) if chunk.get("content_hash") else None
+            if not rows:
+                added.append(chunk)
+                continue
+            row = rows.pop(0)
+            kept[row.id] = chunk["chunk_index"]
+            if row.chunk_index != chunk["chunk_index"]:
+                moved[row.id] = chunk["chunk_index"]
+        removed = [row.id for row in stored if row.id not in kept]
+
+        if removed:
+            await self.session.execute(delete(LatamDocChunk).where(LatamDocChunk.id.in_(removed)))
+        if moved:
+            # (document_id, chunk_index) is checked row by row, so park the moved
+            # rows on negative indexes before giving them their final position
+            await self.session.execute(
+                update(LatamDocChunk)
+                .where(LatamDocChunk.id.in_(list(moved)))
+                .values(
+                    chunk_index=case(
+                        {chunk_id: -1 - index for chunk_id, index in moved.items()},
+                        value=LatamDocChunk.id,
+                    )
+                )
+            )
+            await self.session.execute(
+                update(LatamDocChunk)
+                .where(LatamDocChunk.id.in_(list(moved)))
+                .values(chunk_index=-1 - LatamDocChunk.chunk_index)
+            )
+        if added:
+            await self.copy_chunks([(doc_id, {"chunks": added})], now)
+
+        return {"kept": len(kept), "added": len(added), "removed": len(removed)}
+
+    async def get_embeddings_by_hash(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Stored chunk embeddings for any of the given content hashes"""
+        if not content_hashes:
+            return {}
+        result = await self.session.execute(
+            select(LatamDocChunk.content_hash, LatamDocChunk.embedding)
+            .where(LatamDocChunk.content_hash.in_(content_hashes))
+            .distinct(LatamDocChunk.content_hash)
+        )
+        return {row.content_hash: row.embedding.tolist() for row in result}
+
+    async def set_ef_search(self, ef_search: int) -> None:
+        """Set hnsw.ef_search for the current transaction"""
+        await self.session.execute(
+            select(func.set_config("hnsw.ef_search", str(int(ef_search)), True))
+        )
+
+    async def set_iterative_scan(self, mode: str) -> None:
+        """Set hnsw.iterative_scan (off, strict_order, relaxed_order) for the current transaction"""
+        await self.session.execute(select(func.set_config("hnsw.iterative_scan", mode, True)))
+
+    @staticmethod
+    def filter_clauses(filters: Optional[Dict[str, Any]]) -> List[Any]:
+        """Metadata filters on the parent document"""
+        if not filters:
+            return []
+        clauses = []
+        if filters.get("document_type"):
+            clauses.append(LatamDoc.document_type == filters["document_type"])
+        if filters.get("created_after"):
+            clauses.append(LatamDoc.created_at >= filters["created_after"])
+        if filters.get("created_before"):
+            clauses.append(LatamDoc.created_at < filters["created_before"])
+        return clauses
+
+    @staticmethod
+    def compact_distance(query_vector, storage: str):
+        """Distance over the compact index expression for a storage mode.
 
-            # Convert to JSON
-            embedding_json = json.dumps(query_embedding)
+        The expressions must match the ones in the compact index migration
+        exactly, otherwise Postgres cannot use those indexes.
+        """
+        dim = LatamDocChunk.embedding.type.dim
+        if storage == "halfvec":
+            return cast(LatamDocChunk.embedding, HalfVector(dim)).op("<=>", return_type=Float)(
+                cast(query_vector, HalfVector(dim))
+            )
+        if storage == "binary":
+            return cast(func.binary_quantize(LatamDocChunk.embedding), BIT(dim)).op(
+                "<~>", return_type=Float
+            )(cast(func.binary_quantize(query_vector), BIT(dim)))
+        raise ValueError(f"Unknown vector storage mode: {storage}")
+
+    @staticmethod
+    def chunk_distance(query_vector, space: Optional[EmbeddingSpace] = None):
+        """Exact cosine distance to a chunk's primary vector, or its vector in `space`.
+
+        The space expression must match the partial index built for the space
+        (see DatabaseService.create_space_index).
+        """
+        if space is None:
+            return LatamDocChunk.embedding.cosine_distance(query_vector)
+        vector_type = Vector(space.dimension)
+        return cast(ChunkEmbedding.embedding, vector_type).op("<=>", return_type=Float)(
+            cast(query_vector, vector_type)
+        )
+
+    @staticmethod
+    def space_join(space: EmbeddingSpace):
+        """Join condition from a chunk to its row in `space`"""
+        # Inlined so the planner can match the space's partial index
+        return and_(
+            ChunkEmbedding.chunk_id == LatamDocChunk.id,
+            ChunkEmbedding.space_id == literal(space.id, literal_execute=True),
+        )
 
-            # Use literal with explicit type annotation
+    def vector_candidates(
+        self,
+        query_vector,
+        clauses: List[Any],
+        limit: int,
+        storage: str = "full",
+        rerank_candidates: int = 100,
+        stable: bool = False,
+        space: Optional[EmbeddingSpace] = None,
+        lateral: bool = False,
+    ) -> Select:
+        """Top chunk ids by exact cosine distance, optionally via a compact coarse search.
+
+        `stable` breaks distance ties by id (an incremental sort over the index
+        order), which keyset pagination needs to neither skip nor repeat rows.
+        Secondary embedding spaces always use their own full-precision index.
+        With `lateral` the query vector may be a column of an enclosing query.
+        """
+        distance = self.chunk_distance(query_vector, space)
+        order = (distance, LatamDocChunk.id) if stable else (distance,)
+        if space is not None:
+            query = (
+                select(LatamDocChunk.id, distance.label("distance"))
+                .join(ChunkEmbedding, self.space_join(space))
+                .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                .where(*clauses)
+                .order_by(*order)
+                .limit(limit)
+            )
+            return self.correlate_outer(query) if lateral else query
+        if storage == "full":
+            query = (
+                select(LatamDocChunk.id, distance.label("distance"))
+                .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                .where(*clauses)
+                .order_by(*order)
+                .limit(limit)
+            )
+            return self.correlate_outer(query) if lateral else query
+
+        compact_distance = self.compact_distance(query_vector, storage)
+        coarse = (
+            select(LatamDocChunk.id)
+            .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+            .where(*clauses)
+            .order_by(compact_distance)
+            .limit(max(rerank_candidates, limit))
+        )
+        if lateral:
+            # A CTE cannot see the enclosing row; re-evaluate per query vector instead
+            coarse = self.correlate_outer(coarse).lateral("coarse")
+        else:
+            coarse = coarse.cte("coarse").prefix_with("MATERIALIZED")
+        # Exact re-ranking only reads the full vectors of the coarse candidates
+        query = (
+            select(LatamDocChunk.id, distance.label("distance"))
+            .join(coarse, coarse.c.id == LatamDocChunk.id)
+            .order_by(*order)
+            .limit(limit)
+        )
+        return self.correlate_outer(query) if lateral else query
+
+    @staticmethod
+    def correlate_outer(query: Select) -> Select:
+        """Let a LATERAL subquery reference only the enclosing query's inputs, never its tables"""
+        return query.correlate_except(
+            LatamDocChunk.__table__, LatamDoc.__table__, ChunkEmbedding.__table__
+        )
+
+    async def semantic_search(
+        self,
+        query_embedding: List[float],
+        limit: int = 3,
+        ef_search: Optional[int] = None,
+        similarity_threshold: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None,
+        iterative_scan: str = "relaxed_order",
+        storage: str = "full",
+        rerank_candidates: int = 100,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Mapping[str, Any]]:
+        try:
+            clauses = self.filter_clauses(filters)
+            if ef_search:
+                # HNSW returns at most ef_search rows, so never go below the candidates needed
+                needed = limit if storage == "full" else max(limit, rerank_candidates)
+                await self.set_ef_search(max(ef_search, needed))
+            if clauses:
+                # Keep walking the graph until enough rows pass the filters
+                await self.set_iterative_scan(iterative_scan)
 
-            vector_literal = literal(embedding_json).cast(Vector)
+            # Bound once as a binary float32 vector: no text formatting or parsing
+            query_vector = vector_param("query_embedding", query_embedding)
 
-            # Build query
+            # Nearest chunks first, then their columns. The <=> operator (rather
+            # than the cosine_distance function) lets Postgres use the HNSW index
+            # for ORDER BY ... LIMIT. Filters stay inside the materialized CTE;
+            # the distance cutoff goes outside it so it does not turn into a
+            # scan-everything filter on the index.
+            nearest = (
+                self.vector_candidates(
+                    query_vector, clauses, limit, storage, rerank_candidates, space=space
+                )
+                .cte("nearest")
+                .prefix_with("MATERIALIZED")
+            )
             query = (
                 select(
-                    LatamDoc.id,
+                    LatamDocChunk.id,
+                    LatamDocChunk.document_id,
+                    LatamDocChunk.chunk_index,
                     LatamDoc.filename,
-                    LatamDoc.content,
+                    LatamDocChunk.content,
+                    LatamDocChunk.token_count,
                     LatamDoc.document_type,
                     LatamDoc.created_at,
+                    nearest.c.distance,
+                    (1 - nearest.c.distance).label("similarity"),
                 )
-                .add_columns(
-                    func.cosine_distance(LatamDoc.embedding, vector_literal).label("distance"),
-                    (1 - func.cosine_distance(LatamDoc.embedding, vector_literal)).label(
-                        "similarity"
-                    ),
-                )
-                .order_by("distance")
-                .limit(limit)
+                .join(nearest, nearest.c.id == LatamDocChunk.id)
+                .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                .order_by(nearest.c.distance)
             )
+            if similarity_threshold > 0:
+                query = query.where(nearest.c.distance <= 1 - similarity_threshold)
 
-            # Execute
+            # Execute; rows are returned as read-only mappings, without copying into dicts
             result = await self.session.execute(query)
-
-            # Process results
-            documents = []
-            for row in result:
-                doc_data = {
-                    "id": row[0],
-                    "filename": row[1],
-                    "content": row[2],
-                    "document_type": row[3],
-                    "created_at": row[4].isoformat() if row[4] else None,
-                    "distance": float(row[5]),
-                    "similarity": float(row[6]),
-                }
-                documents.append(doc_data)
-
-            return documents
+            return result.mappings().all()
 
         except Exception as e:
             logger.error(f"Semantic search error: {e}", exc_info=True)
             return []
+
+    async def search_hits(
+        self,
+        query_embedding: List[float],
+        query_text: str,
+        limit: int = 10,
+        after: Optional[Tuple[float, int]] = None,
+        ef_search: Optional[int] = None,
+        similarity_threshold: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None,
+        iterative_scan: str = "relaxed_order",
+        storage: str = "full",
+        rerank_candidates: int = 100,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Mapping[str, Any]]:
+        """One page of nearest chunks as ids, scores and highlighted snippets.
+
+        Pages are ordered by (distance, id); `after` is the last row of the
+        previous page, so deep pages cost an index scan instead of an OFFSET.
+        Content never leaves the database: ts_headline runs on the page rows only.
+        """
+        try:
+            clauses = self.filter_clauses(filters)
+            query_vector = vector_param("query_embedding", query_embedding)
+            distance = self.chunk_distance(query_vector, space)
+            if after is not None:
+                last_distance, last_id = after
+                clauses.append(
+                    or_(
+                        distance > last_distance,
+                        and_(distance == last_distance, LatamDocChunk.id > last_id),
+                    )
+                )
+            if similarity_threshold > 0:
+                # The page ends where the threshold does; no rows past it are scanned for
+                clauses.append(distance <= 1 - similarity_threshold)
+
+            if ef_search:
+                needed = limit if storage == "full" else max(limit, rerank_candidates)
+                await self.set_ef_search(max(ef_search, needed))
+            if clauses:
+                # Later pages filter out everything before the cursor
+                await self.set_iterative_scan(iterative_scan)
+
+            page = (
+                self.vector_candidates(
+                    query_vector,
+                    clauses,
+                    limit,
+                    storage,
+                    rerank_candidates,
+                    stable=True,
+                    space=space,
+                )
+                .cte("page")
+                .prefix_with("MATERIALIZED")
+            )
+            snippet = func.ts_headline(
+                TEXT_SEARCH_CONFIG,
+                LatamDocChunk.content,
+                func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query_text),
+                SNIPPET_OPTIONS,
+            )
+            query = (
+                select(
+                    LatamDocChunk.id,
+                    LatamDocChunk.document_id,
+                    LatamDocChunk.chunk_index,
+                    LatamDoc.filename,
+                    LatamDoc.document_type,
+                    page.c.distance,
+                    (1 - page.c.distance).label("similarity"),
+                    snippet.label("snippet"),
+                )
+                .join(page, page.c.id == LatamDocChunk.id)
+                .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                .order_by(page.c.distance, LatamDocChunk.id)
+            )
+            result = await self.session.execute(query)
+            return result.mappings().all()
+
+        except Exception as e:
+            logger.error(f"Search hits error: {e}", exc_info=True)
+            return []
+
+    async def get_documents(self, document_ids: List[int]) -> List[LatamDoc]:
+        """Documents by id, in the order requested; unknown ids are skipped"""
+        result = await self.session.execute(
+            # Vectors are never part of the response; skip reading them
+            select(LatamDoc)
+            .options(defer(LatamDoc.embedding))
+            .where(LatamDoc.id.in_(document_ids))
+        )
+        by_id = {doc.id: doc for doc in result.scalars().all()}
+        return [by_id[doc_id] for doc_id in document_ids if doc_id in by_id]
+
+    async def get_chunks(self, chunk_ids: List[int]) -> List[LatamDocChunk]:
+        """Chunks by id, in the order requested; unknown ids are skipped"""
+        result = await self.session.execute(
+            select(LatamDocChunk)
+            .options(defer(LatamDocChunk.embedding), defer(LatamDocChunk.content_tsv))
+            .where(LatamDocChunk.id.in_(chunk_ids))
+        )
+        by_id = {chunk.id: chunk for chunk in result.scalars().all()}
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+
+    async def get_chunk_embeddings(self, chunk_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Embeddings of the given chunks, keyed by chunk id"""
+        if not chunk_ids:
+            return {}
+        result = await self.session.execute(
+            select(LatamDocChunk.id, LatamDocChunk.embedding).where(LatamDocChunk.id.in_(chunk_ids))
+        )
+        return {row.id: row.embedding for row in result}
+
+    def fused_candidates(
+        self,
+        query_vector,
+        tsquery,
+        clauses: List[Any],
+        limit: int,
+        candidates: int,
+        rrf_k: int,
+        storage: str = "full",
+        rerank_candidates: int = 100,
+        space: Optional[EmbeddingSpace] = None,
+        lateral: bool = False,
+    ) -> Select:
+        """Top chunk ids by reciprocal-rank fusion of the vector and lexical rankings"""
+        # Rank inside an ORDER BY ... LIMIT subquery so each side stays index-driven
+        vector_top = self.vector_candidates(
+            query_vector,
+            clauses,
+            candidates,
+            storage,
+            rerank_candidates,
+            space=space,
+            lateral=lateral,
+        )
+        vector_top = (
+            vector_top.lateral("vector_top") if lateral else vector_top.subquery("vector_top")
+        )
+        vector_ranked = select(
+            vector_top.c.id,
+            func.row_number().over(order_by=vector_top.c.distance).label("rank"),
+        )
+
+        lexical_score = func.ts_rank_cd(LatamDocChunk.content_tsv, tsquery)
+        lexical_top = (
+            select(LatamDocChunk.id, lexical_score.label("score"))
+            .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+            .where(LatamDocChunk.content_tsv.op("@@")(tsquery), *clauses)
+            .order_by(lexical_score.desc())
+            .limit(candidates)
+        )
+        if lateral:
+            lexical_top = self.correlate_outer(lexical_top).lateral("lexical_top")
+        else:
+            lexical_top = lexical_top.subquery("lexical_top")
+        lexical_ranked = select(
+            lexical_top.c.id,
+            func.row_number().over(order_by=lexical_top.c.score.desc()).label("rank"),
+        )
+
+        ranked = union_all(vector_ranked, lexical_ranked).subquery("ranked")
+        rrf_score = func.sum(1.0 / (rrf_k + ranked.c.rank)).cast(Float)
+        return (
+            select(ranked.c.id, rrf_score.label("rrf_score"))
+            .group_by(ranked.c.id)
+            .order_by(rrf_score.desc())
+            .limit(limit)
+        )
+
+    async def hybrid_search(
+        self,
+        query_embedding: List[float],
+        query_text: str,
+        limit: int = 3,
+        ef_search: Optional[int] = None,
+        candidates: int = 50,
+        rrf_k: int = 60,
+        similarity_threshold: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None,
+        iterative_scan: str = "relaxed_order",
+        storage: str = "full",
+        rerank_candidates: int = 100,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Mapping[str, Any]]:
+        """Lexical + vector search fused with reciprocal-rank fusion, in one round trip.
+
+        Each retriever returns its top `candidates` chunks; a chunk's score is
+        the sum of 1 / (rrf_k + rank) over the retrievers that found it.
+        """
+        try:
+            candidates = max(candidates, limit)
+            clauses = self.filter_clauses(filters)
+            if ef_search:
+                needed = candidates if storage == "full" else max(candidates, rerank_candidates)
+                await self.set_ef_search(max(ef_search, needed))
+            if clauses:
+                await self.set_iterative_scan(iterative_scan)
+
+            query_vector = vector_param("query_embedding", query_embedding)
+            distance = self.chunk_distance(query_vector, space)
+            if space is not None:
+                distance = func.coalesce(distance, 1.0)
+            tsquery = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query_text)
+            fused = self.fused_candidates(
+                query_vector,
+                tsquery,
+                clauses,
+                limit,
+                candidates,
+                rrf_k,
+                storage,
+                rerank_candidates,
+                space,
+            ).subquery("fused")
+
+            # Distance is computed once per hit; similarity is derived from it
+            hits = (
+                select(
+                    LatamDocChunk.id,
+                    LatamDocChunk.document_id,
+                    LatamDocChunk.chunk_index,
+                    LatamDoc.filename,
+                    LatamDocChunk.content,
+                    LatamDocChunk.token_count,
+                    LatamDoc.document_type,
+                    LatamDoc.created_at,
+                    distance.label("distance"),
+                    fused.c.rrf_score,
+                )
+                .join(fused, fused.c.id == LatamDocChunk.id)
+                .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+            )
+            if space is not None:
+                # Lexical hits on chunks not yet backfilled count as unrelated
+                hits = hits.outerjoin(ChunkEmbedding, self.space_join(space))
+            hits = hits.subquery("hits")
+            query = select(hits, (1 - hits.c.distance).label("similarity")).order_by(
+                hits.c.rrf_score.desc()
+            )
+            if similarity_threshold > 0:
+                # Lexical-only hits must still be semantically close enough
+                query = query.where(hits.c.distance <= 1 - similarity_threshold)
+
+            result = await self.session.execute(query)
+            return result.mappings().all()
+
+        except Exception as e:
+            logger.error(f"Hybrid search error: {e}", exc_info=True)
+            return []
+
+    async def batch_search(
+        self,
+        query_embeddings: List[List[float]],
+        query_texts: Optional[List[str]] = None,
+        limit: int = 3,
+        ef_search: Optional[int] = None,
+        candidates: int = 50,
+        rrf_k: int = 60,
+        similarity_threshold: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None,
+        iterative_scan: str = "relaxed_order",
+        storage: str = "full",
+        rerank_candidates: int = 100,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[List[Mapping[str, Any]]]:
+        """Top chunks for many queries in one statement, one result list per query.
+
+        The queries are a VALUES list joined to a LATERAL search, so each row
+        runs the same index-driven top-k as semantic_search (or, with
+        `query_texts`, hybrid_search) with its own vector.
+        """
+        try:
+            hybrid = query_texts is not None
+            clauses = self.filter_clauses(filters)
+            if ef_search:
+                needed = max(limit, candidates) if hybrid else limit
+                if storage != "full":
+                    needed = max(needed, rerank_candidates)
+                await self.set_ef_search(max(ef_search, needed))
+            if clauses:
+                await self.set_iterative_scan(iterative_scan)
+
+            queries = values(
+                column("qid", Integer),
+                column("embedding", BinaryVector()),
+                column("query_text", Text),
+                name="queries",
+            ).data(
+                [
+                    (
+                        qid,
+                        np.asarray(embedding, dtype=np.float32),
+                        query_texts[qid] if hybrid else "",
+                    )
+                    for qid, embedding in enumerate(query_embeddings)
+                ]
+            )
+            columns = (
+                LatamDocChunk.id,
+                LatamDocChunk.document_id,
+                LatamDocChunk.chunk_index,
+                LatamDoc.filename,
+                LatamDocChunk.content,
+                LatamDocChunk.token_count,
+                LatamDoc.document_type,
+                LatamDoc.created_at,
+            )
+
+            if hybrid:
+                tsquery = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, queries.c.query_text)
+                fused = self.fused_candidates(
+                    queries.c.embedding,
+                    tsquery,
+                    clauses,
+                    limit,
+                    max(candidates, limit),
+                    rrf_k,
+                    storage,
+                    rerank_candidates,
+                    space,
+                    lateral=True,
+                ).lateral("fused")
+                distance = self.chunk_distance(queries.c.embedding, space)
+                if space is not None:
+                    distance = func.coalesce(distance, 1.0)
+                hits = (
+                    select(queries.c.qid, *columns, distance.label("distance"), fused.c.rrf_score)
+                    .select_from(queries)
+                    .join(fused, true())
+                    .join(LatamDocChunk, LatamDocChunk.id == fused.c.id)
+                    .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                )
+                if space is not None:
+                    hits = hits.outerjoin(ChunkEmbedding, self.space_join(space))
+                hits = hits.subquery("hits")
+                query = select(hits, (1 - hits.c.distance).label("similarity")).order_by(
+                    hits.c.qid, hits.c.rrf_score.desc()
+                )
+                distance_column = hits.c.distance
+            else:
+                nearest = self.vector_candidates(
+                    queries.c.embedding,
+                    clauses,
+                    limit,
+                    storage,
+                    rerank_candidates,
+                    space=space,
+                    lateral=True,
+                ).lateral("nearest")
+                query = (
+                    select(
+                        queries.c.qid,
+                        *columns,
+                        nearest.c.distance,
+                        (1 - nearest.c.distance).label("similarity"),
+                    )
+                    .select_from(queries)
+                    .join(nearest, true())
+                    .join(LatamDocChunk, LatamDocChunk.id == nearest.c.id)
+                    .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                    .order_by(queries.c.qid, nearest.c.distance)
+                )
+                distance_column = nearest.c.distance
+            if similarity_threshold > 0:
+                query = query.where(distance_column <= 1 - similarity_threshold)
+
+            results: List[List[Mapping[str, Any]]] = [[] for _ in query_embeddings]
+            for row in (await self.session.execute(query)).mappings():
+                results[row["qid"]].append(row)
+            return results
+
+        except Exception as e:
+            logger.error(f"Batch search error: {e}", exc_info=True)
+            return [[] for _ in query_embeddings]
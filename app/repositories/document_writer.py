@@ -0,0 +1,181 @@
+import logging
+import pickle
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, func, insert, literal_column, text, update
+from sqlalchemy.orm import Session
+
+from app.models.document import LatamDoc, LatamDocChunk
+from app.repositories.document_repository import DocumentRepository
+from app.utils.exceptions import ValidationException
+
+logger = logging.getLogger(__name__)
+
+# The streamed text, reassembled from the pieces in upload_content
+UPLOADED_CONTENT = literal_column("(SELECT string_agg(piece, '' ORDER BY seq) FROM upload_content)")
+# Characters of staged text sent per upload_content row
+TEXT_PIECE_CHARS = 1 << 20
+
+
+class DocumentWriter:
+    """Writes one document, created or replacing the one with its filename, as it streams in.
+
+    While the upload is read and embedded, text and embedded chunks are only
+    staged in local temporary files, so no connection, lock or transaction is
+    held. write() then stores everything in one short transaction: the text
+    is copied into a temporary table and assembled by Postgres, and stored
+    chunks of a replaced document are parked on negative indexes; the ones
+    whose content reappears are moved back into place (keeping their ids) and
+    the rest are deleted.
+    """
+
+    def __init__(self, filename: str, file_size: Optional[int] = None):
+        self.filename = filename
+        self.file_size = file_size
+
+        self._text = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self._chunk_batches = tempfile.TemporaryFile("w+b")
+        self._chunks = 0
+        self._embedding_sum: Optional[np.ndarray] = None
+        self.kept = 0
+        self.added = 0
+
+    def write_text(self, piece: str) -> None:
+        self._text.write(piece)
+
+    def write_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        """Stage embedded chunks, in chunk_index order across calls"""
+        if not chunks:
+            return
+        vectors = np.asarray([chunk["embedding"] for chunk in chunks], dtype=np.float32)
+        batch_sum = vectors.sum(axis=0, dtype=np.float64)
+        self._embedding_sum = (
+            batch_sum if self._embedding_sum is None else self._embedding_sum + batch_sum
+        )
+        self._chunks += len(chunks)
+        staged = [{**chunk, "embedding": vector} for chunk, vector in zip(chunks, vectors)]
+        pickle.dump(staged, self._chunk_batches, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close(self) -> None:
+        self._text.close()
+        self._chunk_batches.close()
+
+    async def write(
+        self, session: Session, content_hash: str, content_length: int
+    ) -> Tuple[int, str]:
+        """Store the staged document; returns its id and "created", "updated" or "unchanged" """
+        if not self._chunks:
+            raise ValidationException("El archivo está vacío")
+        repository = DocumentRepository(session)
+        await repository.lock_filenames([self.filename])
+        existing = (await repository.get_by_filenames([self.filename])).get(self.filename)
+        if existing is not None and existing["content_hash"] == content_hash:
+            return existing["id"], "unchanged"
+
+        await self._copy_text(session)
+        now = datetime.utcnow()
+        values = {
+            "content": func.coalesce(UPLOADED_CONTENT, ""),
+            "content_hash": content_hash,
+            "embedding": (self._embedding_sum / self._chunks).tolist(),
+            "file_size": self.file_size,
+            "content_length": content_length,
+            # Taken at write time, so the vector index snapshot sees it as the latest change
+            "updated_at": func.timezone("UTC", func.clock_timestamp()),
+        }
+
+        reusable: Dict[Optional[str], List[int]] = {}
+        if existing is None:
+            status = "created"
+            result = await session.execute(
+                insert(LatamDoc)
+                .values(filename=self.filename, document_type="text", created_at=now, **values)
+                .returning(LatamDoc.id)
+            )
+            document_id = result.scalar_one()
+        else:
+            status = "updated"
+            document_id = existing["id"]
+            result = await session.execute(
+                update(LatamDocChunk)
+                .where(LatamDocChunk.document_id == document_id)
+                .values(chunk_index=-1 - LatamDocChunk.chunk_index)
+                .returning(LatamDocChunk.id, LatamDocChunk.content_hash)
+            )
+            for chunk_id, chunk_hash in result.all():
+                reusable.setdefault(chunk_hash, []).append(chunk_id)
+
+        for chunks in self._staged_chunks():
+            await self._write_chunks(repository, document_id, chunks, reusable, now)
+
+        removed = 0
+        if existing is not None:
+            result = await session.execute(
+                delete(LatamDocChunk).where(
+                    LatamDocChunk.document_id == document_id, LatamDocChunk.chunk_index < 0
+                )
+            )
+            removed = result.rowcount
+            await session.execute(
+                update(LatamDoc).where(LatamDoc.id == document_id).values(**values)
+            )
+        logger.info(
+            f"Streamed document {document_id} ({status}): {self.kept} chunks kept, "
+            f"{self.added} added, {removed} removed"
+        )
+        return document_id, status
+
+    async def _copy_text(self, session: Session) -> None:
+        await session.execute(
+            text("CREATE TEMPORARY TABLE upload_content (seq integer, piece text) ON COMMIT DROP")
+        )
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        async with raw_connection.driver_connection.cursor() as cursor:
+            async with cursor.copy(
+                "COPY upload_content (seq, piece) FROM STDIN WITH (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["int4", "text"])
+                self._text.seek(0)
+                seq = 0
+                while piece := self._text.read(TEXT_PIECE_CHARS):
+                    await copy.write_row((seq, piece))
+                    seq += 1
+
+    def _staged_chunks(self) -> Iterator[List[Dict[str, Any]]]:
+        self._chunk_batches.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._chunk_batches)
+            except EOFError:
+                return
+
+    async def _write_chunks(
+        self,
+        repository: DocumentRepository,
+        document_id: int,
+        chunks: List[Dict[str, Any]],
+        reusable: Dict[Optional[str], List[int]],
+        now: datetime,
+    ) -> None:
+        moved: Dict[int, int] = {}
+        added: List[Dict[str, Any]] = []
+        for chunk in chunks:
+            parked = reusable.get(chunk.get("content_hash"))
+            if parked:
+                moved[parked.pop(0)] = chunk["chunk_index"]
+            else:
+                added.append(chunk)
+        if moved:
+            await repository.session.execute(
+                update(LatamDocChunk)
+                .where(LatamDocChunk.id.in_(list(moved)))
+                .values(chunk_index=case(moved, value=LatamDocChunk.id))
+            )
+        if added:
+            await repository.copy_chunks([(document_id, {"chunks": added})], now)
+        self.kept += len(moved)
+        self.added += len(added)
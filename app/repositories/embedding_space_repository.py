@@ -0,0 +1,172 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.document import LatamDocChunk
+from app.models.embedding_space import ChunkEmbedding, EmbeddingSpace
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingSpaceRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def get_or_create(
+        self, name: str, backend: str, model: str, dimension: int
+    ) -> EmbeddingSpace:
+        """The space for a backend vector-space name, registering it on first use"""
+        await self.session.execute(
+            insert(EmbeddingSpace)
+            .values(
+                name=name,
+                backend=backend,
+                model=model,
+                dimension=dimension,
+                status="backfilling",
+                backfilled_through=0,
+                embedded_count=0,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        return await self.get_by_name(name)
+
+    async def get_by_name(self, name: str) -> Optional[EmbeddingSpace]:
+        result = await self.session.execute(
+            select(EmbeddingSpace).where(EmbeddingSpace.name == name)
+        )
+        return result.scalar_one_or_none()
+
+    async def acquire_lease(self, space_id: int, owner: str, seconds: float) -> bool:
+        """Take or renew the backfill lease; an expired lease can be taken over"""
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            update(EmbeddingSpace)
+            .where(
+                EmbeddingSpace.id == space_id,
+                or_(
+                    EmbeddingSpace.lease_owner.is_(None),
+                    EmbeddingSpace.lease_owner == owner,
+                    EmbeddingSpace.leased_until < now,
+                ),
+            )
+            .values(lease_owner=owner, leased_until=now + timedelta(seconds=seconds))
+            .returning(EmbeddingSpace.id)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def release_lease(self, space_id: int, owner: str) -> None:
+        await self.session.execute(
+            update(EmbeddingSpace)
+            .where(EmbeddingSpace.id == space_id, EmbeddingSpace.lease_owner == owner)
+            .values(lease_owner=None, leased_until=None)
+        )
+
+    async def next_chunks(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """Chunks past the checkpoint, in id order"""
+        result = await self.session.execute(
+            select(LatamDocChunk.id, LatamDocChunk.content)
+            .where(LatamDocChunk.id > after_id)
+            .order_by(LatamDocChunk.id)
+            .limit(limit)
+        )
+        return [(row.id, row.content) for row in result]
+
+    async def missing_chunks(
+        self, space_id: int, limit: int, document_ids: Optional[List[int]] = None
+    ) -> List[Tuple[int, str]]:
+        """Chunks that still have no vector in the space, optionally of some documents only"""
+        query = (
+            select(LatamDocChunk.id, LatamDocChunk.content)
+            .outerjoin(
+                ChunkEmbedding,
+                and_(
+                    ChunkEmbedding.chunk_id == LatamDocChunk.id,
+                    ChunkEmbedding.space_id == space_id,
+                ),
+            )
+            .where(ChunkEmbedding.chunk_id.is_(None))
+        )
+        if document_ids is not None:
+            query = query.where(LatamDocChunk.document_id.in_(document_ids))
+        result = await self.session.execute(query.order_by(LatamDocChunk.id).limit(limit))
+        return [(row.id, row.content) for row in result]
+
+    async def store(
+        self,
+        space_id: int,
+        embeddings: Dict[int, List[float]],
+        checkpoint: Optional[int] = None,
+    ) -> int:
+        """Upsert vectors for chunks that still exist and advance the checkpoint"""
+        # Key-share locks keep the chunks from being deleted before the insert commits
+        existing = (
+            (
+                await self.session.execute(
+                    select(LatamDocChunk.id)
+                    .where(LatamDocChunk.id.in_(list(embeddings)))
+                    .with_for_update(key_share=True)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        now = datetime.utcnow()
+        if existing:
+            statement = insert(ChunkEmbedding).values(
+                [
+                    {
+                        "space_id": space_id,
+                        "chunk_id": chunk_id,
+                        "embedding": np.asarray(embeddings[chunk_id], dtype=np.float32),
+                        "created_at": now,
+                    }
+                    for chunk_id in existing
+                ]
+            )
+            await self.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["space_id", "chunk_id"],
+                    set_={"embedding": statement.excluded.embedding, "created_at": now},
+                )
+            )
+
+        values: Dict[str, Any] = {
+            "embedded_count": EmbeddingSpace.embedded_count + len(existing),
+            "updated_at": now,
+        }
+        if checkpoint is not None:
+            values["backfilled_through"] = func.greatest(
+                EmbeddingSpace.backfilled_through, checkpoint
+            )
+        await self.session.execute(
+            update(EmbeddingSpace).where(EmbeddingSpace.id == space_id).values(**values)
+        )
+        return len(existing)
+
+    async def set_status(self, space_id: int, status: str) -> None:
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {"status": status, "updated_at": now}
+        if status == "ready":
+            values["ready_at"] = now
+        await self.session.execute(
+            update(EmbeddingSpace).where(EmbeddingSpace.id == space_id).values(**values)
+        )
+
+    async def get_embeddings(self, space_id: int, chunk_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Vectors of the given chunks in a space, keyed by chunk id"""
+        if not chunk_ids:
+            return {}
+        result = await self.session.execute(
+            select(ChunkEmbedding.chunk_id, ChunkEmbedding.embedding).where(
+                ChunkEmbedding.space_id == space_id, ChunkEmbedding.chunk_id.in_(chunk_ids)
+            )
+        )
+        return {row.chunk_id: row.embedding for row in result}
@@ -0,0 +1,140 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.ingestion_job import IngestionJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def enqueue(
+        self, filename: str, content: str, file_size: Optional[int], max_attempts: int
+    ) -> IngestionJob:
+        try:
+            job = IngestionJob(
+                filename=filename,
+                content=content,
+                file_size=file_size,
+                status="queued",
+                attempts=0,
+                max_attempts=max_attempts,
+                progress=0.0,
+            )
+            self.session.add(job)
+            await self.session.commit()
+            await self.session.refresh(job)
+            return job
+        except Exception as e:
+            await self.session.rollback()
+            logger.error(f"Error enqueuing ingestion job for {filename}: {e}")
+            raise
+
+    async def claim(self, limit: int, stale_after_seconds: float) -> List[Dict[str, Any]]:
+        """Atomically take up to `limit` runnable jobs.
+
+        FOR UPDATE SKIP LOCKED lets any number of workers, in any process, poll
+        the table without blocking on or double-claiming each other's rows.
+        Running jobs whose claim is older than stale_after_seconds (a worker
+        died mid-job) are taken over. The returned `attempts` is the claim's
+        fencing token: later updates only apply while it is still current.
+        """
+        now = datetime.utcnow()
+        runnable = (
+            select(IngestionJob.id)
+            .where(
+                or_(
+                    and_(IngestionJob.status == "queued", IngestionJob.run_after <= now),
+                    and_(
+                        IngestionJob.status == "running",
+                        IngestionJob.locked_at < now - timedelta(seconds=stale_after_seconds),
+                    ),
+                )
+            )
+            .order_by(IngestionJob.run_after, IngestionJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id.in_(runnable.scalar_subquery()))
+            .values(
+                status="running",
+                attempts=IngestionJob.attempts + 1,
+                locked_at=now,
+                stage="claimed",
+                updated_at=now,
+            )
+            .returning(
+                IngestionJob.id,
+                IngestionJob.filename,
+                IngestionJob.content,
+                IngestionJob.file_size,
+                IngestionJob.attempts,
+                IngestionJob.max_attempts,
+            )
+        )
+        return [dict(row) for row in result.mappings().all()]
+
+    async def _update_claimed(self, job_id: int, attempt: int, **values: Any) -> bool:
+        """Update a job only while `attempt` still holds its claim"""
+        result = await self.session.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.id == job_id,
+                IngestionJob.status == "running",
+                IngestionJob.attempts == attempt,
+            )
+            .values(**values)
+        )
+        return result.rowcount > 0
+
+    async def renew_claim(self, job_id: int, attempt: int) -> bool:
+        """Heartbeat: keep a running job from being considered stale"""
+        now = datetime.utcnow()
+        return await self._update_claimed(job_id, attempt, locked_at=now, updated_at=now)
+
+    async def update_progress(self, job_id: int, attempt: int, progress: float, stage: str) -> bool:
+        """Record progress; also renews the claim"""
+        now = datetime.utcnow()
+        return await self._update_claimed(
+            job_id, attempt, progress=progress, stage=stage, locked_at=now, updated_at=now
+        )
+
+    async def complete(self, job_id: int, attempt: int, document_id: int, chunk_count: int) -> bool:
+        now = datetime.utcnow()
+        return await self._update_claimed(
+            job_id,
+            attempt,
+            status="succeeded",
+            progress=1.0,
+            stage="done",
+            error=None,
+            document_id=document_id,
+            chunk_count=chunk_count,
+            content=None,
+            locked_at=None,
+            updated_at=now,
+            finished_at=now,
+        )
+
+    async def fail(
+        self, job_id: int, attempt: int, error: str, retry_at: Optional[datetime] = None
+    ) -> bool:
+        """Requeue the job for retry_at, or mark it failed for good when None"""
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {"error": error, "locked_at": None, "updated_at": now}
+        if retry_at is not None:
+            values.update(status="queued", stage="retrying", run_after=retry_at)
+        else:
+            values.update(status="failed", stage="failed", finished_at=now)
+        return await self._update_claimed(job_id, attempt, **values)
+
+    async def get(self, job_id: int) -> Optional[IngestionJob]:
+        return await self.session.get(IngestionJob, job_id)
@@ -0,0 +1,167 @@
+import logging
+import math
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A word plus its trailing whitespace, so chunks can be rebuilt verbatim
+WORD_PATTERN = re.compile(r"\S+\s*")
+
+# Average characters per token for OpenAI BPE encodings
+CHARS_PER_TOKEN = 4
+
+# Punctuation (before any closing quotes or brackets) that ends a sentence
+SENTENCE_END = re.compile(r"[.!?:;][\"'»”)\]]*$")
+
+# Words before a break that decide whether it is chosen as a chunk end
+ANCHOR_WORDS = 3
+
+
+class ChunkingService:
+    def __init__(self, chunk_size: int = 300, chunk_overlap: int = 50):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be between 0 and chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate the number of model tokens in a text"""
+        return sum(self._word_tokens(word) for word in WORD_PATTERN.findall(text))
+
+    def split(self, text: str) -> List[Dict[str, Any]]:
+        """Split text into overlapping chunks of at most chunk_size tokens.
+
+        A chunk that fills its window ends at a sentence or line break in the
+        second half of it, when there is one, chosen by the text around it.
+        Boundaries then do not depend on everything before them, so an edit
+        only changes the chunks near it and re-ingestion re-embeds just those.
+        """
+        stream = self.stream()
+        chunks = stream.feed(text) + stream.close()
+        logger.debug(f"Split text of length {len(text)} into {len(chunks)} chunks")
+        return chunks
+
+    def stream(self) -> "ChunkStream":
+        """Incremental splitter for text that arrives in pieces"""
+        return ChunkStream(self)
+
+    def _next_chunk(
+        self, words: List[str], start: int, final: bool
+    ) -> Optional[Tuple[int, int, Optional[int]]]:
+        """(end, tokens, next start) of the chunk at `start`; None if more words are needed"""
+        end = start
+        tokens = 0
+        while end < len(words):
+            word_tokens = self._word_tokens(words[end])
+            if tokens + word_tokens > self.chunk_size and end > start:
+                break
+            tokens += word_tokens
+            end += 1
+
+        if end >= len(words):
+            # The window is not full yet: later text could still belong to it
+            return (end, tokens, None) if final else None
+
+        boundary = self._anchor(words, start + (end - start) // 2 + 1, end)
+        if boundary is not None:
+            tokens -= sum(self._word_tokens(word) for word in words[boundary:end])
+            end = boundary
+
+        # Step back over the trailing words that make up the overlap
+        overlap_start = end
+        overlap_tokens = 0
+        while overlap_start > start + 1:
+            word_tokens = self._word_tokens(words[overlap_start - 1])
+            if overlap_tokens + word_tokens > self.chunk_overlap:
+                break
+            overlap_tokens += word_tokens
+            overlap_start -= 1
+        return end, tokens, overlap_start
+
+    @classmethod
+    def _anchor(cls, words: List[str], low: int, high: int) -> Optional[int]:
+        """Break in words[low:high + 1] picked by the text around it, not its position.
+
+        Among the sentence and line ends in the range, the one whose last words
+        hash lowest wins, so windows that overlap mostly agree on the same break.
+        """
+        best, best_hash = None, None
+        for boundary in range(low, high + 1):
+            if not cls._ends_sentence(words[boundary - 1]):
+                continue
+            anchor_hash = zlib.crc32(
+                "".join(words[max(0, boundary - ANCHOR_WORDS) : boundary]).encode("utf-8")
+            )
+            if best_hash is None or anchor_hash < best_hash:
+                best, best_hash = boundary, anchor_hash
+        return best
+
+    @staticmethod
+    def _ends_sentence(word: str) -> bool:
+        stripped = word.rstrip()
+        return "\n" in word[len(stripped) :] or SENTENCE_END.search(stripped) is not None
+
+    @staticmethod
+    def _word_tokens(word: str) -> int:
+        return max(1, math.ceil(len(word.strip()) / CHARS_PER_TOKEN))
+
+
+class ChunkStream:
+    """ChunkingService.split over text fed in pieces, with the same chunks.
+
+    Chunks are returned as soon as no later text can change them, and only
+    the words of the chunk being built are kept, so memory does not grow
+    with the length of the document.
+    """
+
+    def __init__(self, service: ChunkingService):
+        self.service = service
+        self._words: List[str] = []
+        self._start = 0
+        # Last word seen: the next piece may continue it or its trailing whitespace
+        self._tail = ""
+        self._count = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        words = WORD_PATTERN.findall(self._tail + text)
+        if words:
+            self._tail = words.pop()
+        else:
+            self._tail += text
+        self._words.extend(words)
+        return self._drain(final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Chunks for the rest of the text"""
+        self._words.extend(WORD_PATTERN.findall(self._tail))
+        self._tail = ""
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Dict[str, Any]]:
+        chunks = []
+        while self._start < len(self._words):
+            window = self.service._next_chunk(self._words, self._start, final)
+            if window is None:
+                break
+            end, tokens, next_start = window
+
+            content = "".join(self._words[self._start : end]).strip()
+            if content:
+                chunks.append(
+                    {"chunk_index": self._count, "content": content, "token_count": tokens}
+                )
+                self._count += 1
+
+            if next_start is None:
+                self._start = len(self._words)
+                break
+            self._start = next_start
+            # Keep the words a break just after the new start is hashed with
+            drop = max(0, self._start - ANCHOR_WORDS)
+            del self._words[:drop]
+            self._start -= drop
+        return chunks
@@ -0,0 +1,103 @@
+import logging
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tokens spent on the "\n---\n" separator between chunks
+SEPARATOR_TOKENS = 2
+
+
+class ContextBuilder:
+    """Chooses which retrieved chunks go into the prompt.
+
+    Chunks are picked greedily by maximal marginal relevance: similarity to the
+    question minus, weighted by 1 - mmr_lambda, the similarity to the closest
+    chunk already picked. Chunks at least `duplicate_similarity` close to a
+    picked one are dropped outright, and picking stops adding chunks once the
+    token budget is full. The picked chunks keep their retrieval order.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        token_budget: int = 3000,
+        mmr_lambda: float = 0.7,
+        duplicate_similarity: float = 0.95,
+    ):
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_similarity = duplicate_similarity
+
+    def build(
+        self,
+        query_embedding: List[float],
+        results: List[Mapping[str, Any]],
+        embeddings: Optional[Dict[int, Any]] = None,
+    ) -> List[Mapping[str, Any]]:
+        """Select results for the prompt; without embeddings only the budget applies"""
+        if not results:
+            return []
+
+        vectors = self._vectors(results, embeddings or {})
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        if vectors is None:
+            relevance = np.array([r.get("similarity") or 0.0 for r in results], dtype=np.float32)
+            pairwise = np.zeros((len(results), len(results)), dtype=np.float32)
+        else:
+            relevance = vectors @ query
+            pairwise = vectors @ vectors.T
+
+        tokens = [self._tokens(result) for result in results]
+        remaining = list(range(len(results)))
+        # Similarity of each candidate to its closest selected chunk
+        redundancy = np.zeros(len(results), dtype=np.float32)
+        selected: List[int] = []
+        used = 0
+        duplicates = 0
+
+        while remaining:
+            scores = self.mmr_lambda * relevance[remaining]
+            if selected:
+                scores -= (1 - self.mmr_lambda) * redundancy[remaining]
+            index = remaining.pop(int(np.argmax(scores)))
+
+            if selected and redundancy[index] >= self.duplicate_similarity:
+                duplicates += 1
+                continue
+            # Always keep the best chunk; smaller ones may still fit after an oversized one
+            if selected and used + tokens[index] > self.token_budget:
+                continue
+
+            selected.append(index)
+            used += tokens[index]
+            redundancy = np.maximum(redundancy, pairwise[index])
+
+        logger.info(
+            f"Context: {len(selected)} of {len(results)} chunks, {used} tokens, "
+            f"{duplicates} near-duplicates dropped"
+        )
+        return [results[i] for i in sorted(selected)]
+
+    def _tokens(self, result: Mapping[str, Any]) -> int:
+        count = result.get("token_count") or self.count_tokens(result["content"])
+        return count + SEPARATOR_TOKENS
+
+    def _vectors(
+        self, results: List[Mapping[str, Any]], embeddings: Dict[int, Any]
+    ) -> Optional[np.ndarray]:
+        """Normalized chunk embeddings in result order, or None if any is missing"""
+        rows = [embeddings.get(result["id"]) for result in results]
+        if any(row is None for row in rows):
+            return None
+        matrix = np.asarray(rows, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -1,27 +1,48 @@
 import logging
+import time
 from contextlib import asynccontextmanager, contextmanager
-from typing import Any, AsyncGenerator, Dict, Generator, List
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, Generator, List, Mapping, Optional, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.config.settings import DatabaseConfig
+from app.config.settings import DatabaseConfig, search_config
 from app.models.document import LatamDoc
+from app.models.embedding_space import EmbeddingSpace
+from app.models.ingestion_job import IngestionJob
+from app.repositories.answer_cache_repository import AnswerCacheRepository
 from app.repositories.document_repository import DocumentRepository
+from app.repositories.document_writer import DocumentWriter
+from app.repositories.embedding_space_repository import EmbeddingSpaceRepository
+from app.repositories.job_repository import JobRepository
+from app.services.vector_index import VectorIndex
+from app.utils.metrics import record_stage
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseService:
-    def __init__(self, db_config: DatabaseConfig):
+    def __init__(self, db_config: DatabaseConfig, vector_index: Optional[VectorIndex] = None):
         self.db_config = db_config
+        self.vector_index = vector_index
+
+        # Time spent waiting to check a connection out of the pool
+        self.checkouts = 0
+        self.checkout_wait_total_ms = 0.0
+        self.checkout_wait_max_ms = 0.0
 
     @asynccontextmanager
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         """Async context manager for database sessions"""
         async with self.db_config.SessionLocal() as session:
             try:
+                # Check the connection out up front so pool waits are measured
+                start_time = time.perf_counter()
+                await session.connection()
+                self._record_checkout((time.perf_counter() - start_time) * 1000)
+
                 yield session
                 await session.commit()
             except Exception as e:
@@ -29,23 +50,131 @@ class DatabaseService:
                 raise e
 
     async def create_document(
-        self, filename: str, content: str, embedding: list[float]
+        self,
+        filename: str,
+        content: str,
+        embedding: list[float],
+        chunks: Optional[List[Dict[str, Any]]] = None,
+        file_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
     ) -> LatamDoc:
-        """Create a new document asynchronously"""
+        """Create a new document, and its chunks, asynchronously"""
         async with self.get_session() as session:  # <- async with
             repo = DocumentRepository(session)
             doc = await repo.create_document(
-                filename, content, embedding
+                filename,
+                content,
+                embedding,
+                chunks=chunks,
+                file_size=file_size,
+                content_hash=content_hash,
             )  # await the async repo method
             return doc
 
+    async def upsert_document(
+        self,
+        filename: str,
+        content: str,
+        embedding: List[float],
+        chunks: List[Dict[str, Any]],
+        file_size: Optional[int] = None,
+        content_hash: Optional[str] = None,
+    ) -> Tuple[LatamDoc, str]:
+        """Create a document or update the one with the same filename, diffing its chunks.
+
+        Cached answers built from an updated document are dropped by the
+        latam_docs trigger, in the same transaction.
+        """
+        async with self.get_session() as session:
+            repo = DocumentRepository(session)
+            return await repo.upsert_document(
+                filename, content, embedding, chunks, file_size, content_hash
+            )
+
+    async def bulk_upsert_documents(
+        self, documents: List[Dict[str, Any]]
+    ) -> Tuple[List[int], List[int]]:
+        """Create or update many documents, and their chunks, in one transaction"""
+        async with self.get_session() as session:
+            return await DocumentRepository(session).bulk_upsert_documents(documents)
+
+    @asynccontextmanager
+    async def document_writer(
+        self, filename: str, file_size: Optional[int] = None
+    ) -> AsyncGenerator[DocumentWriter, None]:
+        """Writer for a streamed document, staging it locally until write_document"""
+        writer = DocumentWriter(filename, file_size)
+        try:
+            yield writer
+        finally:
+            writer.close()
+
+    async def write_document(
+        self, writer: DocumentWriter, content_hash: str, content_length: int
+    ) -> Tuple[int, str]:
+        """Store a staged streamed document in one transaction"""
+        async with self.get_session() as session:
+            return await writer.write(session, content_hash, content_length)
+
+    async def get_documents_by_filename(self, filenames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Id, content hash and chunk count of the stored documents with these filenames"""
+        async with self.get_session() as session:
+            return await DocumentRepository(session).get_by_filenames(filenames)
+
+    async def get_embeddings_by_hash(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Embeddings of stored chunks with the given content hashes"""
+        async with self.get_session() as session:
+            return await DocumentRepository(session).get_embeddings_by_hash(content_hashes)
+
     async def search_documents(
-        self, query_embedding: List[float], limit: int = 10, similarity_threshold: float = 0.0
-    ) -> List[Dict[str, Any]]:
-        """Search documents and return formatted results"""
+        self,
+        query_embedding: List[float],
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        query_text: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Mapping[str, Any]]:
+        """Search documents and return formatted results.
+
+        `space` searches a secondary embedding space instead of the primary
+        chunk vectors; the query embedding must come from that space's model.
+        """
+        hybrid = bool(query_text) and search_config.mode == "hybrid"
+        in_memory = self.vector_index is not None and self.vector_index.ready
+        if not hybrid and space is None and in_memory:
+            # Exact search in process memory, no database round trip
+            return self.vector_index.search(query_embedding, limit, similarity_threshold, filters)
+
         async with self.get_session() as session:
             repo = DocumentRepository(session)
-            results = await repo.semantic_search(query_embedding, limit)
+            if hybrid:
+                return await repo.hybrid_search(
+                    query_embedding,
+                    query_text,
+                    limit,
+                    ef_search=ef_search or search_config.hnsw_ef_search,
+                    candidates=search_config.hybrid_candidates,
+                    rrf_k=search_config.rrf_k,
+                    similarity_threshold=similarity_threshold,
+                    filters=filters,
+                    iterative_scan=search_config.iterative_scan,
+                    storage=search_config.vector_storage,
+                    rerank_candidates=search_config.rerank_candidates,
+                    space=space,
+                )
+            results = await repo.semantic_search(
+                query_embedding,
+                limit,
+                ef_search=ef_search or search_config.hnsw_ef_search,
+                similarity_threshold=similarity_threshold,
+                filters=filters,
+                iterative_scan=search_config.iterative_scan,
+                storage=search_config.vector_storage,
+                rerank_candidates=search_config.rerank_candidates,
+                space=space,
+            )
             return results
             # return [
             #     {
@@ -58,11 +187,252 @@ class DatabaseService:
             #     for doc, similarity in results
             # ]
 
+    async def batch_search(
+        self,
+        query_embeddings: List[List[float]],
+        query_texts: Optional[List[str]] = None,
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[List[Mapping[str, Any]]]:
+        """Search for many queries at once, one result list per query embedding"""
+        if not query_embeddings:
+            return []
+        hybrid = bool(query_texts) and search_config.mode == "hybrid"
+        in_memory = self.vector_index is not None and self.vector_index.ready
+        if not hybrid and space is None and in_memory:
+            return [
+                self.vector_index.search(embedding, limit, similarity_threshold, filters)
+                for embedding in query_embeddings
+            ]
+
+        async with self.get_session() as session:
+            return await DocumentRepository(session).batch_search(
+                query_embeddings,
+                query_texts if hybrid else None,
+                limit,
+                ef_search=ef_search or search_config.hnsw_ef_search,
+                candidates=search_config.hybrid_candidates,
+                rrf_k=search_config.rrf_k,
+                similarity_threshold=similarity_threshold,
+                filters=filters,
+                iterative_scan=search_config.iterative_scan,
+                storage=search_config.vector_storage,
+                rerank_candidates=search_config.rerank_candidates,
+                space=space,
+            )
+
+    async def search_hits(
+        self,
+        query_embedding: List[float],
+        query_text: str,
+        limit: int = 10,
+        after: Optional[Tuple[float, int]] = None,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Mapping[str, Any]]:
+        """A keyset-paginated page of search hits with snippets instead of content"""
+        async with self.get_session() as session:
+            repo = DocumentRepository(session)
+            return await repo.search_hits(
+                query_embedding,
+                query_text,
+                limit,
+                after=after,
+                ef_search=ef_search or search_config.hnsw_ef_search,
+                similarity_threshold=similarity_threshold,
+                filters=filters,
+                iterative_scan=search_config.iterative_scan,
+                storage=search_config.vector_storage,
+                rerank_candidates=search_config.rerank_candidates,
+                space=space,
+            )
+
+    async def get_documents(self, document_ids: List[int]) -> List[Dict[str, Any]]:
+        """Full documents for a batch of ids, in one query"""
+        async with self.get_session() as session:
+            repo = DocumentRepository(session)
+            return [doc.to_dict() for doc in await repo.get_documents(document_ids)]
+
+    async def get_chunks(self, chunk_ids: List[int]) -> List[Dict[str, Any]]:
+        """Full chunks for a batch of search hit ids, in one query"""
+        async with self.get_session() as session:
+            repo = DocumentRepository(session)
+            return [chunk.to_dict() for chunk in await repo.get_chunks(chunk_ids)]
+
+    async def get_chunk_embeddings(
+        self, chunk_ids: List[int], space: Optional[EmbeddingSpace] = None
+    ) -> Dict[int, Any]:
+        """Stored embeddings of search hits, for de-duplicating prompt context"""
+        async with self.get_session() as session:
+            if space is not None:
+                return await EmbeddingSpaceRepository(session).get_embeddings(space.id, chunk_ids)
+            repo = DocumentRepository(session)
+            return await repo.get_chunk_embeddings(chunk_ids)
+
+    async def get_or_create_embedding_space(
+        self, name: str, backend: str, model: str, dimension: int
+    ) -> EmbeddingSpace:
+        async with self.get_session() as session:
+            repo = EmbeddingSpaceRepository(session)
+            return await repo.get_or_create(name, backend, model, dimension)
+
+    async def get_embedding_space(self, name: str) -> Optional[EmbeddingSpace]:
+        async with self.get_session() as session:
+            return await EmbeddingSpaceRepository(session).get_by_name(name)
+
+    async def acquire_space_lease(self, space_id: int, owner: str, seconds: float) -> bool:
+        async with self.get_session() as session:
+            repo = EmbeddingSpaceRepository(session)
+            return await repo.acquire_lease(space_id, owner, seconds)
+
+    async def release_space_lease(self, space_id: int, owner: str) -> None:
+        async with self.get_session() as session:
+            await EmbeddingSpaceRepository(session).release_lease(space_id, owner)
+
+    async def get_backfill_batch(
+        self,
+        space_id: int,
+        after_id: int,
+        limit: int,
+        missing: bool = False,
+        document_ids: Optional[List[int]] = None,
+    ) -> List[Tuple[int, str]]:
+        """Next chunks to embed into a space: past the checkpoint, or gaps behind it.
+
+        With `document_ids`, the chunks of those documents still missing a vector.
+        """
+        async with self.get_session() as session:
+            repo = EmbeddingSpaceRepository(session)
+            if missing or document_ids is not None:
+                return await repo.missing_chunks(space_id, limit, document_ids)
+            return await repo.next_chunks(after_id, limit)
+
+    async def store_space_embeddings(
+        self,
+        space_id: int,
+        embeddings: Dict[int, List[float]],
+        checkpoint: Optional[int] = None,
+    ) -> int:
+        async with self.get_session() as session:
+            repo = EmbeddingSpaceRepository(session)
+            return await repo.store(space_id, embeddings, checkpoint)
+
+    async def set_space_status(self, space_id: int, status: str) -> None:
+        async with self.get_session() as session:
+            await EmbeddingSpaceRepository(session).set_status(space_id, status)
+
+    async def create_space_index(self, space: EmbeddingSpace) -> None:
+        """Build the space's partial HNSW index without blocking writes.
+
+        CREATE INDEX CONCURRENTLY cannot run in a transaction, so this uses its
+        own autocommit connection. A leftover invalid index from an interrupted
+        build is dropped first.
+        """
+        statements = [
+            f"DROP INDEX CONCURRENTLY IF EXISTS {space.index_name}",
+            f"CREATE INDEX CONCURRENTLY {space.index_name} ON chunk_embeddings "
+            f"USING hnsw ((embedding::vector({int(space.dimension)})) vector_cosine_ops) "
+            f"WITH (m = 16, ef_construction = 64) WHERE space_id = {int(space.id)}",
+        ]
+        async with self.db_config.engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            for statement in statements:
+                await connection.execute(text(statement))
+
+    async def find_cached_answer(
+        self, query_embedding: List[float], min_similarity: float, max_age_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        """Look up a cached RAG answer for a semantically similar question"""
+        async with self.get_session() as session:
+            repo = AnswerCacheRepository(session)
+            return await repo.find_similar(query_embedding, min_similarity, max_age_seconds)
+
+    async def store_cached_answer(
+        self,
+        question: str,
+        query_embedding: List[float],
+        response: Dict[str, Any],
+        source_document_ids: List[int],
+    ) -> None:
+        """Cache a RAG answer keyed by its question embedding"""
+        async with self.get_session() as session:
+            repo = AnswerCacheRepository(session)
+            await repo.store(question, query_embedding, response, source_document_ids)
+
+    async def enqueue_ingestion_job(
+        self, filename: str, content: str, file_size: Optional[int], max_attempts: int
+    ) -> IngestionJob:
+        """Queue a document for background ingestion"""
+        async with self.get_session() as session:
+            repo = JobRepository(session)
+            return await repo.enqueue(filename, content, file_size, max_attempts)
+
+    async def claim_ingestion_jobs(
+        self, limit: int, stale_after_seconds: float
+    ) -> List[Dict[str, Any]]:
+        """Take runnable ingestion jobs for this worker"""
+        async with self.get_session() as session:
+            repo = JobRepository(session)
+            return await repo.claim(limit, stale_after_seconds)
+
+    async def renew_job_claim(self, job_id: int, attempt: int) -> bool:
+        async with self.get_session() as session:
+            return await JobRepository(session).renew_claim(job_id, attempt)
+
+    async def update_job_progress(
+        self, job_id: int, attempt: int, progress: float, stage: str
+    ) -> bool:
+        async with self.get_session() as session:
+            return await JobRepository(session).update_progress(job_id, attempt, progress, stage)
+
+    async def complete_job(
+        self, job_id: int, attempt: int, document_id: int, chunk_count: int
+    ) -> bool:
+        async with self.get_session() as session:
+            return await JobRepository(session).complete(job_id, attempt, document_id, chunk_count)
+
+    async def fail_job(
+        self, job_id: int, attempt: int, error: str, retry_at: Optional[datetime] = None
+    ) -> bool:
+        async with self.get_session() as session:
+            return await JobRepository(session).fail(job_id, attempt, error, retry_at)
+
+    async def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        async with self.get_session() as session:
+            job = await JobRepository(session).get(job_id)
+            return job.to_dict() if job else None
+
     async def test_connection(self) -> bool:
         try:
-            async for session in self.get_session():
-                await session.execute("SELECT 1")
+            async with self.get_session() as session:
+                await session.execute(text("SELECT 1"))
             return True
         except Exception as e:
             logger.error(f"=====Database connection test failed: {e}")
             return False
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Live connection pool usage and checkout wait times"""
+        pool = self.db_config.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "checkout_wait_avg_ms": (
+                self.checkout_wait_total_ms / self.checkouts if self.checkouts else 0.0
+            ),
+            "checkout_wait_max_ms": self.checkout_wait_max_ms,
+        }
+
+    def _record_checkout(self, wait_ms: float) -> None:
+        record_stage("db_pool_wait", wait_ms / 1000)
+        self.checkouts += 1
+        self.checkout_wait_total_ms += wait_ms
+        self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, wait_ms)
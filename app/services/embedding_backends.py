@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from app.services.rate_limiter import OpenAIRateLimiter, Priority, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Character n-grams make inflections ("reembolso", "reembolsos") share features
+CHAR_NGRAM = 4
+CHAR_NGRAM_WEIGHT = 0.5
+
+
+class EmbeddingBackend(ABC):
+    """Turns batches of texts into fixed-size vectors.
+
+    `name` identifies the vector space (model and dimension): the embedding
+    cache and the embedding spaces are keyed by it, so vectors from different
+    backends or dimensions never mix.
+    """
+
+    model: str
+    dimension: int
+
+    @property
+    def name(self) -> str:
+        return self.model
+
+    @abstractmethod
+    async def embed(
+        self, texts: List[str], priority: Priority = Priority.INTERACTIVE
+    ) -> List[List[float]]:
+        """One vector per text, in input order"""
+
+    async def ping(self) -> bool:
+        """Cheap reachability check that does not embed anything"""
+        return True
+
+    async def test_connection(self) -> bool:
+        try:
+            await self.embed(["test"])
+            return True
+        except Exception as e:
+            logger.error(f"Embedding backend {self.model} test failed: {e}")
+            return False
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        dimension: int,
+        limiter: Optional[OpenAIRateLimiter] = None,
+    ):
+        self.client = client
+        self.model = model
+        self.dimension = dimension
+        self.limiter = limiter
+
+    @property
+    def name(self) -> str:
+        # The same text-embedding-3 model yields different spaces per dimension
+        if self.shortens:
+            return f"{self.model}-{self.dimension}"
+        return self.model
+
+    @property
+    def shortens(self) -> bool:
+        """Only the text-embedding-3 family can shorten its vectors"""
+        return self.model.startswith("text-embedding-3")
+
+    async def ping(self) -> bool:
+        # Model metadata is free and still checks the key and model access
+        await self.client.models.retrieve(self.model)
+        return True
+
+    async def embed(
+        self, texts: List[str], priority: Priority = Priority.INTERACTIVE
+    ) -> List[List[float]]:
+        """Embed a batch of texts with a single provider request"""
+        kwargs = {}
+        if self.shortens:
+            kwargs["dimensions"] = self.dimension
+        if self.limiter:
+            response = await self.limiter.call(
+                lambda: self.client.embeddings.with_raw_response.create(
+                    model=self.model, input=texts, **kwargs
+                ),
+                priority=priority,
+                tokens=sum(estimate_tokens(text) for text in texts),
+            )
+        else:
+            response = await self.client.embeddings.create(model=self.model, input=texts, **kwargs)
+        # Items carry their input position; keep the caller's order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """In-process CPU encoder: hashed word and character n-gram features, randomly projected.
+
+    Each feature maps to a fixed pseudo-random Gaussian vector derived from its
+    hash, and a text is the normalized, sublinearly weighted sum of its feature
+    vectors. That is a random projection of the hashed term-frequency vector,
+    so texts sharing vocabulary land close together. No network and no model
+    download; quality is lexical rather than semantic, which suits bulk
+    reindexing and offline environments.
+    """
+
+    def __init__(self, dimension: int, seed: int = 0, feature_cache_size: int = 100_000):
+        self.dimension = dimension
+        self.seed = seed
+        self.model = f"local-hash-{dimension}-{seed}"
+        self.feature_cache_size = feature_cache_size
+        self._feature_vectors: Dict[str, np.ndarray] = {}
+
+    async def embed(
+        self, texts: List[str], priority: Priority = Priority.INTERACTIVE
+    ) -> List[List[float]]:
+        # CPU bound; keep it off the event loop
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+    def embed_sync(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text).tolist() for text in texts]
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        features = self.features(text)
+        if not features:
+            # No words (punctuation, symbols, whitespace): a zero vector has no cosine
+            # distance, so fall back to one feature for the whole stripped text
+            features = {f"t:{text.strip()}": [1, 1.0]}
+        weights = np.array(
+            [(1 + math.log(count)) * weight for count, weight in features.values()],
+            dtype=np.float32,
+        )
+        vectors = np.stack([self._feature_vector(feature) for feature in features])
+        vector = weights @ vectors
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def features(text: str) -> Dict[str, List[float]]:
+        """Feature -> [count, weight] for the words and character n-grams of a text"""
+        # Case and accent insensitive, so "Política" and "politica" match
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(char for char in text if not unicodedata.combining(char))
+
+        counts: Counter = Counter()
+        weights: Dict[str, float] = {}
+        for word in WORD_PATTERN.findall(text):
+            counts[f"w:{word}"] += 1
+            weights[f"w:{word}"] = 1.0
+            if len(word) > CHAR_NGRAM:
+                padded = f"<{word}>"
+                for i in range(len(padded) - CHAR_NGRAM + 1):
+                    key = f"c:{padded[i : i + CHAR_NGRAM]}"
+                    counts[key] += 1
+                    weights[key] = CHAR_NGRAM_WEIGHT
+        return {key: [count, weights[key]] for key, count in counts.items()}
+
+    def _feature_vector(self, feature: str) -> np.ndarray:
+        vector: Optional[np.ndarray] = self._feature_vectors.get(feature)
+        if vector is None:
+            digest = hashlib.blake2b(
+                feature.encode(), digest_size=8, key=str(self.seed).encode()
+            ).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vector = rng.standard_normal(self.dimension, dtype=np.float32)
+            if len(self._feature_vectors) >= self.feature_cache_size:
+                self._feature_vectors.clear()
+            self._feature_vectors[feature] = vector
+        return vector
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Dispatch = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into batched provider calls.
+
+    Texts submitted within max_wait_ms of each other (or until max_batch_size
+    is reached) are sent in one request. Identical texts already in flight share
+    the same pending result instead of being sent again.
+    """
+
+    def __init__(self, max_batch_size: int = 100, max_wait_ms: float = 5.0):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # Per model: texts waiting for the next flush and the dispatch to use
+        self._queues: Dict[str, List[str]] = {}
+        self._dispatchers: Dict[str, Dispatch] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # Queued or in-flight texts keyed by (model, text)
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # Strong references so running batches are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.errors = 0
+
+    async def embed(self, model: str, text: str, dispatch: Dispatch) -> List[float]:
+        """Embed one text, sharing a provider call with concurrent callers"""
+        return (await self.embed_many(model, [text], dispatch))[0]
+
+    async def embed_many(
+        self, model: str, texts: List[str], dispatch: Dispatch
+    ) -> List[List[float]]:
+        """Embed several texts through the shared batching queue"""
+        futures = [self._submit(model, text, dispatch) for text in texts]
+        # Shield so one cancelled caller does not cancel a result others wait on
+        return list(await asyncio.gather(*(asyncio.shield(future) for future in futures)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching and deduplication counters"""
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+            "inflight": len(self._inflight),
+            "errors": self.errors,
+        }
+
+    def _submit(self, model: str, text: str, dispatch: Dispatch) -> asyncio.Future:
+        self.submitted += 1
+        key = (model, text)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+
+        queue = self._queues.setdefault(model, [])
+        queue.append(text)
+        # Every dispatch for a model is equivalent; keep the first of the window
+        self._dispatchers.setdefault(model, dispatch)
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.max_wait, self._flush, model)
+        return future
+
+    def _flush(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        texts = self._queues.pop(model, [])
+        dispatch: Optional[Dispatch] = self._dispatchers.pop(model, None)
+        if texts and dispatch is not None:
+            task = asyncio.get_running_loop().create_task(self._run_batch(model, texts, dispatch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, model: str, texts: List[str], dispatch: Dispatch) -> None:
+        self.batches += 1
+        self.batched_texts += len(texts)
+        try:
+            embeddings = await dispatch(texts)
+            if len(embeddings) != len(texts):
+                raise RuntimeError(
+                    f"Embedding provider returned {len(embeddings)} results for {len(texts)} inputs"
+                )
+            for text, embedding in zip(texts, embeddings):
+                future = self._inflight.pop((model, text), None)
+                if future is not None and not future.done():
+                    future.set_result(embedding)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for text in texts:
+                future = self._inflight.pop((model, text), None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        except asyncio.CancelledError:
+            for text in texts:
+                future = self._inflight.pop((model, text), None)
+                if future is not None:
+                    future.cancel()
+            raise
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-process LRU with TTL backed by a Postgres table"""
+
+    def __init__(
+        self,
+        session_factory=None,
+        max_size: int = 10000,
+        ttl_seconds: float = 86400,
+    ):
+        # Without a session factory the cache is memory-only
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.persistent_errors = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize unicode and collapse whitespace so equivalent texts share a key"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up normalized texts, returning None for each miss"""
+        hashes = [self.text_hash(text) for text in texts]
+        results: List[Optional[List[float]]] = [self._get_memory(model, h) for h in hashes]
+        self.memory_hits += sum(1 for result in results if result is not None)
+
+        missing = {h for h, result in zip(hashes, results) if result is None}
+        if missing:
+            stored = await self._get_persistent(model, missing)
+            for i, h in enumerate(hashes):
+                if results[i] is None and h in stored:
+                    results[i] = stored[h]
+                    self._set_memory(model, h, stored[h])
+            self.persistent_hits += sum(1 for h in hashes if h in stored)
+
+        self.misses += sum(1 for result in results if result is None)
+        return results
+
+    async def set_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store embeddings for normalized texts in both tiers"""
+        values = {}
+        for text, embedding in zip(texts, embeddings):
+            h = self.text_hash(text)
+            self._set_memory(model, h, embedding)
+            values[h] = embedding
+        await self._set_persistent(model, values)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters"""
+        hits = self.memory_hits + self.persistent_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persistent_errors": self.persistent_errors,
+        }
+
+    def _get_memory(self, model: str, h: str) -> Optional[List[float]]:
+        key = f"{model}:{h}"
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, embedding = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return embedding
+
+    def _set_memory(self, model: str, h: str, embedding: List[float]) -> None:
+        key = f"{model}:{h}"
+        self._entries[key] = (time.monotonic(), embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _get_persistent(self, model: str, hashes: set) -> Dict[str, List[float]]:
+        if self.session_factory is None:
+            return {}
+        try:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.embedding).where(
+                        EmbeddingCacheEntry.model == model,
+                        EmbeddingCacheEntry.text_hash.in_(hashes),
+                    )
+                )
+                return {row[0]: [float(x) for x in row[1]] for row in result}
+        except Exception as e:
+            # The persistent tier is an optimization; never fail the request over it
+            self.persistent_errors += 1
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+    async def _set_persistent(self, model: str, values: Dict[str, List[float]]) -> None:
+        if self.session_factory is None or not values:
+            return
+        try:
+            async with self.session_factory() as session:
+                await session.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values(
+                        [
+                            {"model": model, "text_hash": h, "embedding": embedding}
+                            for h, embedding in values.items()
+                        ]
+                    )
+                    .on_conflict_do_nothing(index_elements=["model", "text_hash"])
+                )
+                await session.commit()
+        except Exception as e:
+            self.persistent_errors += 1
+            logger.warning(f"Embedding cache store failed: {e}")
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.embedding_space import EmbeddingSpace
+from app.services.database_service import DatabaseService
+from app.services.embedding_service import EmbeddingService
+from app.services.rate_limiter import Priority
+
+logger = logging.getLogger(__name__)
+
+# pgvector HNSW indexes accept at most this many dimensions for `vector`
+MAX_INDEXED_DIMENSION = 2000
+
+
+class EmbeddingMigration:
+    """Moves the corpus to a new embedding model without downtime.
+
+    Chunks are re-embedded with the target backend into chunk_embeddings, a
+    batch at a time at bulk priority, with a pause of `batch_interval` between
+    batches so ingestion and searches keep their share of the provider quota.
+    After each batch the last chunk id is checkpointed in embedding_spaces, so
+    a restart resumes where it stopped. One process at a time holds the
+    backfill lease; the rest only refresh the space status.
+
+    Once every chunk has a vector the space's HNSW index is built concurrently
+    and the space becomes ready. With read_mode "auto" queries switch to it
+    then; "primary" and "target" pin reads to one side. Ingestion embeds the
+    chunks it writes into the space right away (embed_documents); anything it
+    misses is backfilled every `poll_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        database_service: DatabaseService,
+        embedding_service: EmbeddingService,
+        backend: str,
+        read_mode: str = "auto",
+        batch_size: int = 100,
+        batch_interval: float = 1.0,
+        poll_interval: float = 30.0,
+        lease_seconds: float = 120.0,
+    ):
+        if read_mode not in ("primary", "target", "auto"):
+            raise ValueError("read_mode must be primary, target or auto")
+        self.database_service = database_service
+        self.embedding_service = embedding_service
+        self.backend = backend
+        self.read_mode = read_mode
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        self.space: Optional[EmbeddingSpace] = None
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.embedded = 0
+        self.errors = 0
+        self.last_batch_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self.embedding_service.model
+
+    async def start(self) -> None:
+        backend = self.embedding_service.backend
+        self.space = await self.database_service.get_or_create_embedding_space(
+            self.name, self.backend, backend.model, backend.dimension
+        )
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        logger.info(f"Embedding space {self.name} is {self.space.status}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.space is not None:
+            try:
+                await self.database_service.release_space_lease(self.space.id, self._owner)
+            except Exception as e:
+                logger.warning(f"Could not release the backfill lease: {e}")
+
+    async def embed_documents(self, document_ids: List[int]) -> int:
+        """Embed the chunks of just-written documents into the space right away.
+
+        Ingestion calls this so new content is searchable in the target space
+        without waiting for the next backfill poll. Returns the vectors stored.
+        """
+        if self.space is None or not document_ids:
+            return 0
+        stored = 0
+        while True:
+            chunks = await self.database_service.get_backfill_batch(
+                self.space.id, 0, self.batch_size, document_ids=document_ids
+            )
+            if not chunks:
+                return stored
+            added = await self._embed_batch(chunks, None)
+            if not added:
+                # The chunks were deleted meanwhile
+                return stored
+            stored += added
+
+    def read_space(self) -> Optional[EmbeddingSpace]:
+        """Space queries should use, or None for the primary chunk vectors"""
+        if self.space is None or self.read_mode == "primary":
+            return None
+        if self.read_mode == "target" or self.space.status == "ready":
+            return self.space
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "space": self.space.to_dict() if self.space else None,
+            "read_mode": self.read_mode,
+            "reading_target": self.read_space() is not None,
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "errors": self.errors,
+            "last_batch_age_seconds": (
+                time.time() - self.last_batch_at if self.last_batch_at else None
+            ),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.space = await self.database_service.get_embedding_space(self.name)
+                if await self.database_service.acquire_space_lease(
+                    self.space.id, self._owner, self.lease_seconds
+                ):
+                    await self._backfill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Embedding backfill for {self.name} failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _backfill(self) -> None:
+        """Embed batches until caught up, then finish the space if it is new"""
+        space = self.space
+        while True:
+            chunks = await self.database_service.get_backfill_batch(
+                space.id, space.backfilled_through, self.batch_size
+            )
+            checkpoint = chunks[-1][0] if chunks else None
+            if not chunks:
+                # Past the checkpoint: only chunks that were skipped or re-written remain
+                chunks = await self.database_service.get_backfill_batch(
+                    space.id, space.backfilled_through, self.batch_size, missing=True
+                )
+            if not chunks:
+                break
+
+            await self._embed_batch(chunks, checkpoint)
+            if checkpoint is not None:
+                space.backfilled_through = checkpoint
+            # Renewing the lease also stops us if another process took it over
+            if not await self.database_service.acquire_space_lease(
+                space.id, self._owner, self.lease_seconds
+            ):
+                return
+            await asyncio.sleep(self.batch_interval)
+
+        # An interrupted index build resumes from "indexing"
+        if space.status != "ready":
+            await self._finish(space)
+
+    async def _embed_batch(self, chunks: List[Tuple[int, str]], checkpoint: Optional[int]) -> int:
+        embeddings = await self.embedding_service.get_embeddings(
+            [content for _, content in chunks], priority=Priority.BULK
+        )
+        stored = await self.database_service.store_space_embeddings(
+            self.space.id,
+            {chunk_id: embedding for (chunk_id, _), embedding in zip(chunks, embeddings)},
+            checkpoint,
+        )
+        self.batches += 1
+        self.embedded += stored
+        self.last_batch_at = time.time()
+        logger.debug(f"Backfilled {stored} chunks into {self.name}")
+        return stored
+
+    async def _finish(self, space: EmbeddingSpace) -> None:
+        await self.database_service.set_space_status(space.id, "indexing")
+        if space.dimension <= MAX_INDEXED_DIMENSION:
+            logger.info(f"Embedding space {self.name} backfilled; building its HNSW index")
+            await self.database_service.create_space_index(space)
+        else:
+            logger.warning(
+                f"Embedding space {self.name} has {space.dimension} dimensions, above the "
+                f"HNSW limit of {MAX_INDEXED_DIMENSION}; it will be searched without an index"
+            )
+        await self.database_service.set_space_status(space.id, "ready")
+        self.space = await self.database_service.get_embedding_space(self.name)
+        logger.info(f"Embedding space {self.name} is ready")
@@ -1,16 +1,39 @@
+import asyncio
+import functools
 import logging
 import time
 from typing import List, Optional
 
 from openai import AsyncOpenAI
 
+from app.services.embedding_backends import EmbeddingBackend
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache
+from app.services.rate_limiter import OpenAIRateLimiter, Priority
+
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
-    def __init__(self, client: AsyncOpenAI):
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        batch_size: int = 100,
+        cache: Optional[EmbeddingCache] = None,
+        batcher: Optional[EmbeddingBatcher] = None,
+        client: Optional[AsyncOpenAI] = None,
+        rate_limiter: Optional[OpenAIRateLimiter] = None,
+    ):
+        self.backend = backend
+        # Chat client for answer generation; None when no API key is configured
         self.client = client
-        self.model = "text-embedding-ada-002"
+        # Shared OpenAI admission control, also used for answer generation
+        self.rate_limiter = rate_limiter
+        # Vector-space name: keys the cache and the batcher queues
+        self.model = backend.name
+        self.batch_size = batch_size
+        self.cache = cache
+        self.batcher = batcher
 
     async def get_embedding(self, text: str) -> Optional[List[float]]:
         """Generate embedding for a single text"""
@@ -20,8 +43,18 @@ class EmbeddingService:
 
         try:
             start_time = time.time()
-            response = await self.client.embeddings.create(model=self.model, input=text.strip())
-            embedding = response.data[0].embedding
+            text = EmbeddingCache.normalize(text)
+            if self.cache:
+                cached = (await self.cache.get_many(self.model, [text]))[0]
+                if cached is not None:
+                    return cached
+
+            if self.batcher:
+                embedding = await self.batcher.embed(self.model, text, self._create_embeddings)
+            else:
+                embedding = (await self._create_embeddings([text]))[0]
+            if self.cache:
+                await self.cache.set_many(self.model, [text], [embedding])
             processing_time = (time.time() - start_time) * 1000
 
             logger.info(
@@ -32,21 +65,85 @@ class EmbeddingService:
             logger.error(f"Error generating embedding: {e}")
             raise
 
+    async def get_embeddings(
+        self, texts: List[str], priority: Priority = Priority.BULK
+    ) -> List[List[float]]:
+        """Generate embeddings for several texts using batched requests.
+
+        Defaults to bulk priority: callers are ingestion paths that can wait
+        behind interactive queries.
+        """
+        if not texts:
+            return []
+
+        inputs = [EmbeddingCache.normalize(text) if text else "" for text in texts]
+        if not all(inputs):
+            raise ValueError("Empty text provided for embedding")
+
+        try:
+            start_time = time.time()
+            if self.cache:
+                embeddings = await self.cache.get_many(self.model, inputs)
+            else:
+                embeddings = [None] * len(inputs)
+
+            # Embed each distinct missing text once
+            missing = list(dict.fromkeys(t for t, e in zip(inputs, embeddings) if e is None))
+            dispatch = functools.partial(self._create_embeddings, priority=priority)
+            if self.batcher:
+                generated = await self.batcher.embed_many(
+                    self._batch_queue(priority), missing, dispatch
+                )
+            else:
+                batches = [
+                    missing[i : i + self.batch_size]
+                    for i in range(0, len(missing), self.batch_size)
+                ]
+                results = await asyncio.gather(*(dispatch(b) for b in batches))
+                generated = [embedding for result in results for embedding in result]
+            if self.cache and missing:
+                await self.cache.set_many(self.model, missing, generated)
+
+            by_text = dict(zip(missing, generated))
+            embeddings = [e if e is not None else by_text[t] for t, e in zip(inputs, embeddings)]
+            processing_time = (time.time() - start_time) * 1000
+
+            logger.info(
+                f"Generated {len(missing)} of {len(embeddings)} embeddings in "
+                f"{processing_time:.2f}ms"
+            )
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}")
+            raise
+
+    async def _create_embeddings(
+        self, texts: List[str], priority: Priority = Priority.INTERACTIVE
+    ) -> List[List[float]]:
+        """Embed a batch of texts with a single backend call"""
+        return await self.backend.embed(texts, priority)
+
+    def _batch_queue(self, priority: Priority) -> str:
+        """Batcher queue name; bulk texts never hold up an interactive batch"""
+        if priority == Priority.INTERACTIVE:
+            return self.model
+        return f"{self.model}:{priority.name.lower()}"
+
     def validate_embedding(self, embedding: List[float]) -> bool:
         """Validate embedding format and dimensions"""
         if not isinstance(embedding, list):
             return False
-        if len(embedding) != 1536:  # OpenAI embedding dimension
+        if len(embedding) != self.backend.dimension:
             return False
         if not all(isinstance(x, (int, float)) for x in embedding):
             return False
         return True
 
+    async def ping(self) -> bool:
+        """Cheap backend reachability check for health probes"""
+        return await self.backend.ping()
+
     async def test_connection(self) -> bool:
-        """Test OpenAI API connection"""
-        try:
-            await self.get_embedding("test")
-            return True
-        except Exception as e:
-            logger.error(f"OpenAI connection test failed: {e}")
-            return False
+        """Test the embedding backend"""
+        # Bypass the cache so the provider is actually reached
+        return await self.backend.test_connection()
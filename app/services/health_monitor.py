@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Check = Callable[[], Awaitable[bool]]
+
+
+class HealthMonitor:
+    """Runs dependency checks in the background and serves their last result.
+
+    Each check is refreshed every `interval` seconds while healthy. After a
+    failure it is retried with exponential backoff (capped at `max_backoff`)
+    so a struggling dependency is not hammered by probes. Readiness endpoints
+    read the cached status instead of doing I/O per request.
+    """
+
+    def __init__(
+        self,
+        checks: Dict[str, Check],
+        interval: float = 15.0,
+        max_backoff: float = 60.0,
+        timeout: float = 5.0,
+    ):
+        self.checks = checks
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {
+                "ok": False,
+                "last_checked_at": None,
+                "last_success_at": None,
+                "consecutive_failures": 0,
+                "error": None,
+            }
+            for name in checks
+        }
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self) -> None:
+        """Run every check once, then keep refreshing them in the background"""
+        await self.check_all()
+        for name in self.checks:
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._run(name))
+
+    async def stop(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    async def check_all(self) -> bool:
+        results = await asyncio.gather(*(self._check(name) for name in self.checks))
+        return all(results)
+
+    def is_ready(self) -> bool:
+        return all(status["ok"] for status in self._status.values())
+
+    def is_ok(self, name: str) -> bool:
+        return self._status[name]["ok"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Last known status of every check, with the age of each result"""
+        now = time.time()
+        checks = {}
+        for name, status in self._status.items():
+            checked_at: Optional[float] = status["last_checked_at"]
+            checks[name] = {
+                "ok": status["ok"],
+                "last_check_age_seconds": now - checked_at if checked_at else None,
+                "consecutive_failures": status["consecutive_failures"],
+                "error": status["error"],
+            }
+        return {"ready": self.is_ready(), "checks": checks, "timestamp": now}
+
+    async def _run(self, name: str) -> None:
+        while True:
+            failures = self._status[name]["consecutive_failures"]
+            delay = self.interval
+            if failures:
+                delay = min(self.max_backoff, self.interval * 2 ** (failures - 1))
+            await asyncio.sleep(delay)
+            await self._check(name)
+
+    async def _check(self, name: str) -> bool:
+        status = self._status[name]
+        try:
+            ok = await asyncio.wait_for(self.checks[name](), timeout=self.timeout)
+            error = None if ok else "check returned false"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+
+        now = time.time()
+        if ok:
+            if status["consecutive_failures"]:
+                logger.info(f"Health check {name} recovered")
+            status["last_success_at"] = now
+            status["consecutive_failures"] = 0
+        else:
+            status["consecutive_failures"] += 1
+            logger.warning(
+                f"Health check {name} failed ({status['consecutive_failures']} in a row): {error}"
+            )
+        status["ok"] = ok
+        status["error"] = error
+        status["last_checked_at"] = now
+        return ok
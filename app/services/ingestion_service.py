@@ -0,0 +1,375 @@
+import asyncio
+import codecs
+import hashlib
+import logging
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.chunking_service import ChunkingService
+from app.services.database_service import DatabaseService
+from app.services.embedding_migration import EmbeddingMigration
+from app.services.embedding_service import EmbeddingService
+from app.utils.exceptions import ValidationException
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Called with (stage, fraction done) as a document moves through ingestion
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+
+class IngestionService:
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        database_service: DatabaseService,
+        chunking_service: ChunkingService,
+        migration: Optional[EmbeddingMigration] = None,
+    ):
+        self.embedding_service = embedding_service
+        self.database_service = database_service
+        self.chunking_service = chunking_service
+        # Set while moving to a new embedding model; new chunks are embedded into its space too
+        self.migration = migration
+
+    async def prepare_document(
+        self,
+        filename: str,
+        text_content: str,
+        file_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Chunk and embed a document without storing it.
+
+        Chunks whose content is already stored, in this or any other document,
+        reuse that vector; only new content is sent to the embedding backend.
+        """
+        if on_progress:
+            await on_progress("chunking", 0.05)
+        with timed("chunk"):
+            chunks = self.chunking_service.split(text_content)
+        if not chunks:
+            raise ValidationException("El archivo está vacío")
+        for chunk in chunks:
+            chunk["content_hash"] = self.content_hash(chunk["content"])
+
+        if on_progress:
+            await on_progress("embedding", 0.2)
+        embedded_chunks = await self.embed_chunks(chunks)
+
+        return {
+            "filename": filename,
+            "content": text_content,
+            "content_hash": self.content_hash(text_content),
+            "embedding": self.mean_embedding([chunk["embedding"] for chunk in chunks]),
+            "chunks": chunks,
+            "file_size": file_size,
+            "embedded_chunks": embedded_chunks,
+        }
+
+    async def embed_chunks(self, chunks: List[Dict[str, Any]]) -> int:
+        """Set each chunk's embedding, reusing stored vectors for known content.
+
+        Returns how many distinct texts had to be embedded.
+        """
+        known = await self.database_service.get_embeddings_by_hash(
+            list({chunk["content_hash"] for chunk in chunks})
+        )
+        missing = {
+            chunk["content_hash"]: chunk["content"]
+            for chunk in chunks
+            if chunk["content_hash"] not in known
+        }
+        # Embed the new content with batched requests
+        if missing:
+            with timed("upload_embed"):
+                embeddings = await self.embedding_service.get_embeddings(list(missing.values()))
+            known.update(zip(missing, embeddings))
+        for chunk in chunks:
+            chunk["embedding"] = known[chunk["content_hash"]]
+        return len(missing)
+
+    async def ingest_document(
+        self,
+        filename: str,
+        text_content: str,
+        file_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Chunk, embed and store a document, replacing the one with the same filename.
+
+        Content identical to the stored version is skipped without chunking or
+        embedding; otherwise only the chunks that changed are embedded and written.
+        """
+        try:
+            start_time = time.time()
+
+            stored = await self.database_service.get_documents_by_filename([filename])
+            if self.is_unchanged(stored.get(filename), text_content):
+                logger.info(f"{filename} is unchanged since its last upload; skipping")
+                return {
+                    "document_id": stored[filename]["id"],
+                    "status": "unchanged",
+                    "chunk_count": stored[filename]["chunk_count"],
+                    "embedded_chunks": 0,
+                    "processing_time_ms": (time.time() - start_time) * 1000,
+                }
+
+            prepared = await self.prepare_document(filename, text_content, file_size, on_progress)
+            embedded_chunks = prepared.pop("embedded_chunks")
+            embed_time = (time.time() - start_time) * 1000
+
+            if on_progress:
+                await on_progress("storing", 0.8)
+
+            with timed("upload_insert"):
+                doc, status = await self.database_service.upsert_document(**prepared)
+            await self.embed_into_target_space([doc.id])
+            total_time = (time.time() - start_time) * 1000
+
+            logger.info(
+                f"Ingested {filename} ({status}) as {len(prepared['chunks'])} chunks, "
+                f"{embedded_chunks} embedded, in {total_time:.2f}ms "
+                f"(embedding: {embed_time:.2f}ms)"
+            )
+            return {
+                "document_id": doc.id,
+                "status": status,
+                "chunk_count": len(prepared["chunks"]),
+                "embedded_chunks": embedded_chunks,
+                "processing_time_ms": total_time,
+            }
+        except Exception as e:
+            logger.error(f"Error ingesting document {filename}: {e}")
+            raise
+
+    async def ingest_stream(
+        self,
+        filename: str,
+        blocks: AsyncIterable[bytes],
+        file_size: Optional[int] = None,
+        prefetch_batches: int = 4,
+    ) -> Dict[str, Any]:
+        """Ingest a document while it is being read, with memory bounded by the batch size.
+
+        Blocks are decoded incrementally and split into the same chunks as
+        ingest_document would make. Every `embedding_batch_size` chunks are
+        embedded in a task of their own, up to `prefetch_batches` ahead of the
+        writer, which stages text and chunks in local temporary files. The
+        database is only touched, in one short transaction, once the whole
+        document has been read and embedded.
+        """
+        start_time = time.time()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        chunker = self.chunking_service.stream()
+        hasher = hashlib.sha256()
+        batch_size = self.embedding_service.batch_size
+        # Text pieces and (chunks, embedding task) pairs in order, then None or the read error
+        queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch_batches)
+        stats = {"chunks": 0, "embedded_chunks": 0, "content_length": 0}
+
+        async def produce() -> None:
+            pending: List[Dict[str, Any]] = []
+
+            async def emit(text: str, chunks: List[Dict[str, Any]], final: bool = False) -> None:
+                if text:
+                    hasher.update(text.encode("utf-8"))
+                    stats["content_length"] += len(text)
+                    await queue.put(text)
+                for chunk in chunks:
+                    chunk["content_hash"] = self.content_hash(chunk["content"])
+                pending.extend(chunks)
+                while len(pending) >= batch_size or (final and pending):
+                    batch = pending[:batch_size]
+                    del pending[:batch_size]
+                    task = asyncio.create_task(self.embed_chunks(batch))
+                    try:
+                        await queue.put((batch, task))
+                    except asyncio.CancelledError:
+                        task.cancel()
+                        raise
+
+            try:
+                async for block in blocks:
+                    text = decoder.decode(block)
+                    await emit(text, chunker.feed(text))
+                text = decoder.decode(b"", final=True)
+                await emit(text, chunker.feed(text) + chunker.close(), final=True)
+            except Exception as e:
+                # Hand the failure to the writer so the partial document is rolled back
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        async def consume() -> Tuple[int, str]:
+            async with self.database_service.document_writer(filename, file_size) as writer:
+                while (item := await queue.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    if isinstance(item, str):
+                        writer.write_text(item)
+                        continue
+                    batch, task = item
+                    stats["embedded_chunks"] += await task
+                    stats["chunks"] += len(batch)
+                    writer.write_chunks(batch)
+                with timed("upload_insert"):
+                    return await self.database_service.write_document(
+                        writer, hasher.hexdigest(), stats["content_length"]
+                    )
+
+        producer = asyncio.create_task(produce())
+        try:
+            document_id, status = await consume()
+            await producer
+        except BaseException as e:
+            producer.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, tuple):
+                    item[1].cancel()
+            if not isinstance(e, ValidationException):
+                logger.error(f"Error streaming document {filename}: {e}")
+            raise
+        if status != "unchanged":
+            await self.embed_into_target_space([document_id])
+
+        total_time = (time.time() - start_time) * 1000
+        logger.info(
+            f"Streamed {filename} ({status}) as {stats['chunks']} chunks, "
+            f"{stats['embedded_chunks']} embedded, in {total_time:.2f}ms"
+        )
+        return {
+            "document_id": document_id,
+            "status": status,
+            "chunk_count": stats["chunks"],
+            "embedded_chunks": stats["embedded_chunks"],
+            "content_length": stats["content_length"],
+            "processing_time_ms": total_time,
+        }
+
+    async def ingest_many(
+        self,
+        files: AsyncIterable[Dict[str, Any]],
+        concurrency: int = 4,
+        write_batch_size: int = 50,
+    ) -> Dict[str, Any]:
+        """Bulk ingest a stream of files.
+
+        Each item has filename, content and optionally file_size. Up to
+        `concurrency` files are chunked and embedded at once (their embedding
+        requests are coalesced by the batcher), and prepared documents are
+        written in transactions of `write_batch_size` documents. Files already
+        stored with the same content are skipped; changed ones replace the
+        stored document with that filename.
+        """
+        start_time = time.time()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        pending: List[Dict[str, Any]] = []
+        write_lock = asyncio.Lock()
+        stats = {
+            "documents": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "chunks": 0,
+            "embedded_chunks": 0,
+            "document_ids": [],
+            "failed": [],
+        }
+
+        async def flush() -> None:
+            async with write_lock:
+                batch = pending[:]
+                pending.clear()
+                if not batch:
+                    return
+                with timed("upload_insert"):
+                    doc_ids, updated_ids = await self.database_service.bulk_upsert_documents(batch)
+                stats["documents"] += len(doc_ids)
+                stats["updated"] += len(updated_ids)
+                stats["chunks"] += sum(len(doc["chunks"]) for doc in batch)
+                stats["embedded_chunks"] += sum(doc["embedded_chunks"] for doc in batch)
+                stats["document_ids"].extend(doc_ids)
+            await self.embed_into_target_space(doc_ids)
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                try:
+                    stored = await self.database_service.get_documents_by_filename(
+                        [item["filename"]]
+                    )
+                    if self.is_unchanged(stored.get(item["filename"]), item["content"]):
+                        stats["unchanged"] += 1
+                        stats["document_ids"].append(stored[item["filename"]]["id"])
+                        continue
+                    prepared = await self.prepare_document(
+                        item["filename"], item["content"], item.get("file_size")
+                    )
+                except Exception as e:
+                    logger.warning(f"Skipping {item['filename']}: {e}")
+                    stats["failed"].append({"filename": item["filename"], "error": str(e)})
+                    continue
+                pending.append(prepared)
+                if len(pending) >= write_batch_size:
+                    await flush()
+
+        async def produce() -> None:
+            try:
+                async for item in files:
+                    await queue.put(item)
+            finally:
+                for _ in range(concurrency):
+                    await queue.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks.extend(asyncio.create_task(worker()) for _ in range(concurrency))
+        try:
+            await asyncio.gather(*tasks)
+            await flush()
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            logger.error(f"Error in bulk ingestion: {e}")
+            raise
+
+        elapsed = time.time() - start_time
+        stats["processing_time_ms"] = elapsed * 1000
+        stats["docs_per_second"] = stats["documents"] / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"Bulk ingested {stats['documents']} documents ({stats['updated']} updated, "
+            f"{stats['chunks']} chunks, {stats['embedded_chunks']} embedded) and skipped "
+            f"{stats['unchanged']} unchanged in {elapsed:.2f}s, "
+            f"{stats['docs_per_second']:.2f} docs/s"
+        )
+        return stats
+
+    async def embed_into_target_space(self, document_ids: List[int]) -> None:
+        """Embed written chunks into the target space of an ongoing model migration.
+
+        Otherwise searches reading that space would miss the new content until
+        the next backfill poll. Failures are left to that backfill.
+        """
+        if self.migration is None:
+            return
+        try:
+            await self.migration.embed_documents(document_ids)
+        except Exception as e:
+            logger.warning(f"Could not embed documents into {self.migration.name}: {e}")
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def is_unchanged(cls, stored: Optional[Dict[str, Any]], text_content: str) -> bool:
+        """Whether a stored document (from get_documents_by_filename) has this exact content"""
+        return stored is not None and stored["content_hash"] == cls.content_hash(text_content)
+
+    @staticmethod
+    def mean_embedding(embeddings: List[List[float]]) -> List[float]:
+        """Average chunk embeddings into a document-level embedding"""
+        count = len(embeddings)
+        return [sum(values) / count for values in zip(*embeddings)]
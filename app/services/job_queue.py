@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.services.database_service import DatabaseService
+from app.services.ingestion_service import IngestionService
+from app.utils.exceptions import ValidationException
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionJobQueue:
+    """Asyncio worker pool over the Postgres-backed ingestion_jobs table.
+
+    Uploads are enqueued and answered immediately; `concurrency` workers per
+    process claim jobs with SKIP LOCKED, so several app processes can share
+    the queue. Failed jobs are retried with exponential backoff up to their
+    max_attempts; validation errors fail straight away.
+
+    While a job runs its claim is renewed every third of `stale_after`, so
+    slow stages (embedding under backoff) are not taken over. Every update is
+    fenced by the claim's attempt number: a worker whose job was taken over
+    anyway cannot overwrite the new owner's status.
+    """
+
+    def __init__(
+        self,
+        database_service: DatabaseService,
+        ingestion_service: IngestionService,
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0,
+        retry_delay: float = 5.0,
+        stale_after: float = 300.0,
+    ):
+        self.database_service = database_service
+        self.ingestion_service = ingestion_service
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def start(self) -> None:
+        for i in range(self.concurrency - len(self._workers)):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+        logger.info(f"Started {self.concurrency} ingestion workers")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def enqueue(
+        self, filename: str, content: str, file_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store a job and wake an idle local worker"""
+        job = await self.database_service.enqueue_ingestion_job(
+            filename, content, file_size, self.max_attempts
+        )
+        self._wakeup.set()
+        return job.to_dict()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                jobs = await self.database_service.claim_ingestion_jobs(1, self.stale_after)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker {index} could not claim jobs: {e}")
+                jobs = []
+
+            if not jobs:
+                # Sleep until a local enqueue or the next poll (other processes enqueue too)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for job in jobs:
+                try:
+                    await self._process(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Could not even record the outcome; the claim goes stale and is retried
+                    logger.error(f"Ingestion worker {index} lost job {job['id']}: {e}")
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        job_id, attempt = job["id"], job["attempts"]
+        if attempt > job["max_attempts"]:
+            # Claimed again after its worker died on the last attempt
+            await self.database_service.fail_job(job_id, attempt, "Se agotaron los reintentos")
+            self.failed += 1
+            return
+
+        async def on_progress(stage: str, progress: float) -> None:
+            try:
+                await self.database_service.update_job_progress(job_id, attempt, progress, stage)
+            except Exception as e:
+                logger.warning(f"Could not record progress for job {job_id}: {e}")
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, attempt))
+        try:
+            result = await self.ingestion_service.ingest_document(
+                job["filename"], job["content"] or "", job["file_size"], on_progress=on_progress
+            )
+            if not await self.database_service.complete_job(
+                job_id, attempt, result["document_id"], result["chunk_count"]
+            ):
+                logger.warning(f"Ingestion job {job_id} finished after losing its claim")
+                return
+            self.processed += 1
+            logger.info(f"Ingestion job {job_id} ({job['filename']}) succeeded: {result['status']}")
+        except asyncio.CancelledError:
+            # Shutting down: the stale claim is picked up again after stale_after
+            raise
+        except Exception as e:
+            retryable = not isinstance(e, ValidationException)
+            if retryable and attempt < job["max_attempts"]:
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                delay *= random.uniform(0.8, 1.2)
+                retry_at = datetime.utcnow() + timedelta(seconds=delay)
+                if await self.database_service.fail_job(job_id, attempt, str(e), retry_at):
+                    self.retried += 1
+                    logger.warning(
+                        f"Ingestion job {job_id} attempt {attempt} failed, "
+                        f"retrying in {delay:.1f}s: {e}"
+                    )
+            elif await self.database_service.fail_job(job_id, attempt, str(e)):
+                self.failed += 1
+                logger.error(f"Ingestion job {job_id} failed: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: int, attempt: int) -> None:
+        """Renew the claim of a running job until it finishes or is taken over"""
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                if not await self.database_service.renew_job_claim(job_id, attempt):
+                    logger.warning(f"Ingestion job {job_id} was taken over by another worker")
+                    return
+            except Exception as e:
+                logger.warning(f"Could not renew the claim of job {job_id}: {e}")
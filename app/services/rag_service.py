@@ -1,38 +1,115 @@
+import asyncio
 import logging
 import time
-from typing import Any, Dict, List
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 from openai import AsyncOpenAI
 
+from app.config.settings import answer_cache_config, context_config
 from app.models.document import LatamDoc
+from app.models.embedding_space import EmbeddingSpace
+from app.services.chunking_service import ChunkingService
+from app.services.context_builder import ContextBuilder
 from app.services.database_service import DatabaseService
+from app.services.embedding_migration import EmbeddingMigration
 from app.services.embedding_service import EmbeddingService
+from app.services.rate_limiter import Priority, estimate_tokens
+from app.utils.metrics import ANSWER_CACHE_LOOKUPS, record_stage, timed
+from app.utils.pagination import decode_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
+CHAT_MODEL = "gpt-3.5-turbo"
+MAX_ANSWER_TOKENS = 500
+NO_RESULTS_ANSWER = "No se encontró información relevante en los documentos de política."
+# Retrieval settings cached answers are built with; queries asking for others skip the cache
+CACHED_LIMIT = 10
+CACHED_SIMILARITY_THRESHOLD = 0.0
+
 
 class RAGService:
-    def __init__(self, embedding_service: EmbeddingService, database_service: DatabaseService):
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        database_service: DatabaseService,
+        migration: Optional[EmbeddingMigration] = None,
+    ):
         self.embedding_service = embedding_service
         self.database_service = database_service
+        # Set while moving to a new embedding model; decides which space queries read
+        self.migration = migration
         self.openai_client = embedding_service.client
+        self.rate_limiter = embedding_service.rate_limiter
+        self.context_builder = ContextBuilder(
+            ChunkingService().count_tokens,
+            token_budget=context_config.token_budget,
+            mmr_lambda=context_config.mmr_lambda,
+            duplicate_similarity=context_config.duplicate_similarity,
+        )
+
+    async def embed_query(
+        self, text: str
+    ) -> Tuple[Optional[List[float]], Optional[EmbeddingSpace]]:
+        """Embed a query with the model of the space searches currently read from"""
+        service, space = self.query_embedding_service()
+        return await service.get_embedding(text), space
+
+    def query_embedding_service(self) -> Tuple[EmbeddingService, Optional[EmbeddingSpace]]:
+        """The space searches currently read from and the service embedding its queries"""
+        space = self.migration.read_space() if self.migration else None
+        service = self.migration.embedding_service if space is not None else self.embedding_service
+        return service, space
 
     async def search_similar_documents(
-        self, query: str, limit: int = 10, similarity_threshold: float = 0.0
+        self,
+        query: str,
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
     ) -> List[Dict[str, Any]]:
         """Search for similar documents based on query"""
+        # Generate query embedding
+        with timed("embed"):
+            query_embedding, space = await self.embed_query(query)
+        if not query_embedding:
+            return []
+
+        return await self.search_by_embedding(
+            query_embedding,
+            limit,
+            similarity_threshold,
+            ef_search=ef_search,
+            query_text=query,
+            filters=filters,
+            space=space,
+        )
+
+    async def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        query_text: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents given an already computed query embedding"""
         try:
             start_time = time.time()
 
-            # Generate query embedding
-            query_embedding = await self.embedding_service.get_embedding(query)
-            if not query_embedding:
-                return []
-
             # Search database
-            results = await self.database_service.search_documents(
-                query_embedding, limit, similarity_threshold
-            )
+            with timed("search"):
+                results = await self.database_service.search_documents(
+                    query_embedding,
+                    limit,
+                    similarity_threshold,
+                    ef_search=ef_search,
+                    query_text=query_text,
+                    filters=filters,
+                    space=space,
+                )
 
             search_time = (time.time() - start_time) * 1000
             logger.info(
@@ -44,34 +121,194 @@ class RAGService:
             logger.error(f"Error in RAG search: {e}")
             raise
 
-    async def generate_response(self, context: List[str], question: str) -> str:
-        """Generate response using OpenAI with context"""
+    async def search_hits(
+        self,
+        query: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """One page of hits (ids, scores, snippets) and the cursor for the next page"""
+        after = decode_cursor(cursor)
+        with timed("embed"):
+            query_embedding, space = await self.embed_query(query)
+        if not query_embedding:
+            return {"hits": [], "next_cursor": None}
+
+        # One extra row tells whether another page exists
+        with timed("search"):
+            rows = await self.database_service.search_hits(
+                query_embedding,
+                query,
+                limit + 1,
+                after=after,
+                similarity_threshold=similarity_threshold,
+                ef_search=ef_search,
+                filters=filters,
+                space=space,
+            )
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(page[-1]["distance"], page[-1]["id"])
+        hits = [
+            {
+                "chunk_id": row["id"],
+                "document_id": row["document_id"],
+                "chunk_index": row["chunk_index"],
+                "filename": row["filename"],
+                "document_type": row["document_type"],
+                "similarity": row["similarity"],
+                "snippet": row["snippet"],
+            }
+            for row in page
+        ]
+        return {"hits": hits, "next_cursor": next_cursor}
+
+    def _require_chat_client(self) -> None:
+        if self.openai_client is None:
+            raise ValueError("OPENAI_API_KEY is required to generate answers")
+
+    async def _create_completion(
+        self,
+        messages: List[Dict[str, str]],
+        stream: bool = False,
+        priority: Priority = Priority.INTERACTIVE,
+    ):
+        """Chat completion request, admitted through the shared rate limiter"""
+        kwargs = {
+            "model": CHAT_MODEL,
+            "messages": messages,
+            "max_tokens": MAX_ANSWER_TOKENS,
+            "temperature": 0.3,
+        }
+        if stream:
+            kwargs["stream"] = True
+        if self.rate_limiter is None:
+            return await self.openai_client.chat.completions.create(**kwargs)
+        # Prompt plus the largest possible answer; corrected from usage when reported
+        tokens = sum(estimate_tokens(m["content"]) for m in messages) + MAX_ANSWER_TOKENS
+        return await self.rate_limiter.call(
+            lambda: self.openai_client.chat.completions.with_raw_response.create(**kwargs),
+            priority=priority,
+            tokens=tokens,
+        )
+
+    async def build_context(
+        self,
+        query_embedding: List[float],
+        search_results: List[Dict[str, Any]],
+        space: Optional[EmbeddingSpace] = None,
+    ) -> List[Dict[str, Any]]:
+        """Relevant, non-redundant search results that fit the prompt token budget"""
         try:
-            start_time = time.time()
+            embeddings = await self.database_service.get_chunk_embeddings(
+                [result["id"] for result in search_results], space=space
+            )
+        except Exception as e:
+            # Still enforce the budget, just without de-duplication
+            logger.warning(f"Could not load chunk embeddings for context: {e}")
+            embeddings = {}
+        return self.context_builder.build(query_embedding, search_results, embeddings)
 
-            # Format context
-            full_context = "\n---\n".join(context)
+    def build_messages(self, context: List[str], question: str) -> List[Dict[str, str]]:
+        """Build the chat messages for a question and its context"""
+        # Format context
+        full_context = "\n---\n".join(context)
 
-            # System prompt for LATAM Airlines
-            system_prompt = (
-                "Eres un asistente de servicio al cliente de LATAM Airlines. "
-                "Responde a la pregunta del usuario de forma concisa usando ÚNICAMENTE el contexto proporcionado. "
-                "Si la respuesta no está en el contexto, di: 'Lo siento, no tengo esa información en las políticas internas.'"
+        # System prompt for LATAM Airlines
+        system_prompt = (
+            "Eres un asistente de servicio al cliente de LATAM Airlines. "
+            "Responde a la pregunta del usuario de forma concisa usando ÚNICAMENTE el contexto proporcionado. "
+            "Si la respuesta no está en el contexto, di: 'Lo siento, no tengo esa información en las políticas internas.'"
+        )
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": f"Contexto:\n{full_context}\n\nPregunta: {question}",
+            },
+        ]
+
+    @staticmethod
+    def use_answer_cache(
+        limit: int,
+        similarity_threshold: float,
+        ef_search: Optional[int],
+        filters: Optional[Dict[str, Any]],
+        space: Optional[EmbeddingSpace],
+    ) -> bool:
+        """Whether a query may be answered from, and stored in, the answer cache.
+
+        Cached answers come from the default retrieval over the unfiltered
+        corpus, keyed by primary-model vectors: queries with other retrieval
+        settings, filters or another embedding space skip the cache.
+        """
+        return (
+            not filters
+            and space is None
+            and limit == CACHED_LIMIT
+            and similarity_threshold == CACHED_SIMILARITY_THRESHOLD
+            and ef_search is None
+        )
+
+    async def get_cached_answer(self, query_embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Return a cached answer for a semantically equivalent question, if any"""
+        if not answer_cache_config.enabled:
+            return None
+        try:
+            with timed("answer_cache"):
+                cached = await self.database_service.find_cached_answer(
+                    query_embedding,
+                    answer_cache_config.similarity_threshold,
+                    answer_cache_config.ttl_seconds,
+                )
+        except Exception as e:
+            # A cache failure only costs a regular RAG query
+            logger.warning(f"Answer cache lookup failed: {e}")
+            ANSWER_CACHE_LOOKUPS.inc("error")
+            return None
+        ANSWER_CACHE_LOOKUPS.inc("hit" if cached else "miss")
+        if cached:
+            logger.info(f"Answer cache hit (similarity {cached['similarity']:.4f})")
+        return cached
+
+    async def cache_answer(
+        self,
+        question: str,
+        query_embedding: List[float],
+        response: Dict[str, Any],
+        search_results: List[Dict[str, Any]],
+    ) -> None:
+        """Store an answer with the documents it was generated from"""
+        if not answer_cache_config.enabled:
+            return
+        try:
+            await self.database_service.store_cached_answer(
+                question,
+                query_embedding,
+                response,
+                [result["document_id"] for result in search_results],
             )
+        except Exception as e:
+            logger.warning(f"Could not cache answer: {e}")
+
+    async def generate_response(
+        self, context: List[str], question: str, priority: Priority = Priority.INTERACTIVE
+    ) -> str:
+        """Generate response using OpenAI with context"""
+        try:
+            start_time = time.time()
+            self._require_chat_client()
 
             # Generate response
-            completion = await self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {
-                        "role": "user",
-                        "content": f"Contexto:\n{full_context}\n\nPregunta: {question}",
-                    },
-                ],
-                max_tokens=500,
-                temperature=0.3,
-            )
+            with timed("generate"):
+                completion = await self._create_completion(
+                    self.build_messages(context, question), priority=priority
+                )
 
             response = completion.choices[0].message.content
             generation_time = (time.time() - start_time) * 1000
@@ -82,41 +319,261 @@ class RAGService:
             logger.error(f"Error generating response: {e}")
             raise
 
+    async def generate_response_stream(
+        self, context: List[str], question: str
+    ) -> AsyncGenerator[str, None]:
+        """Generate response using OpenAI with context, yielding tokens as they arrive"""
+        try:
+            start_time = time.time()
+            self._require_chat_client()
+
+            stream = await self._create_completion(
+                self.build_messages(context, question), stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+            generation_time = (time.time() - start_time) * 1000
+            record_stage("generate", generation_time / 1000)
+            logger.info(f"Streamed response in {generation_time:.2f}ms")
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            raise
+
     async def rag_query(
-        self, question: str, limit: int = 10, similarity_threshold: float = 0.0
+        self,
+        question: str,
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """Complete RAG query process"""
         try:
             start_time = time.time()
 
+            with timed("embed"):
+                query_embedding, space = await self.embed_query(question)
+            if not query_embedding:
+                return {"answer": NO_RESULTS_ANSWER, "context_used": [], "sources": []}
+
+            # Serve paraphrases of recent questions without retrieval or generation
+            use_cache = self.use_answer_cache(
+                limit, similarity_threshold, ef_search, filters, space
+            )
+            cached = await self.get_cached_answer(query_embedding) if use_cache else None
+            if cached:
+                return {
+                    **cached["response"],
+                    "cached": True,
+                    "processing_time_ms": (time.time() - start_time) * 1000,
+                }
+
             # Search for similar documents
-            search_results = await self.search_similar_documents(
-                question, limit, similarity_threshold
+            search_results = await self.search_by_embedding(
+                query_embedding,
+                limit,
+                similarity_threshold,
+                ef_search=ef_search,
+                query_text=question,
+                filters=filters,
+                space=space,
             )
 
             if not search_results:
                 return {
-                    "answer": "No se encontró información relevante en los documentos de política.",
+                    "answer": NO_RESULTS_ANSWER,
                     "context_used": [],
                     "sources": [],
                 }
 
             # Extract context
-            context_chunks = [result["content"] for result in search_results]
-            sources = [
-                {"filename": result["filename"], "similarity": result["similarity"]}
-                for result in search_results
-            ]
+            with timed("context"):
+                context_results = await self.build_context(query_embedding, search_results, space)
+                context_chunks = [result["content"] for result in context_results]
+                sources = self.build_sources(context_results)
             # Generate response
             answer = await self.generate_response(context_chunks, question)
+
+            response = {"answer": answer, "context_used": context_chunks, "sources": sources}
+            if use_cache:
+                await self.cache_answer(question, query_embedding, response, search_results)
             total_time = (time.time() - start_time) * 1000
 
-            return {
-                "answer": answer,
+            return {**response, "cached": False, "processing_time_ms": total_time}
+        except Exception as e:
+            logger.error(f"Error in RAG query: {e}")
+            raise
+
+    async def batch_query(
+        self,
+        questions: List[str],
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        generate: bool = False,
+        concurrency: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """Retrieve, and optionally answer, many questions at once.
+
+        All questions are embedded with one batched request and searched with
+        one database round trip. Answers are generated at most `concurrency`
+        at a time; a failed generation is reported on its question instead of
+        failing the batch. Embedding and generation both run at bulk priority,
+        behind interactive queries. The answer cache is bypassed so evaluation runs
+        always see fresh answers.
+        """
+        start_time = time.time()
+        service, space = self.query_embedding_service()
+        with timed("embed"):
+            embeddings = await service.get_embeddings(questions, priority=Priority.BULK)
+        with timed("search"):
+            all_results = await self.database_service.batch_search(
+                embeddings,
+                questions,
+                limit,
+                similarity_threshold,
+                ef_search=ef_search,
+                filters=filters,
+                space=space,
+            )
+        logger.info(
+            f"Batch search for {len(questions)} questions completed in "
+            f"{(time.time() - start_time) * 1000:.2f}ms"
+        )
+
+        if not generate:
+            return [
+                {
+                    "question": question,
+                    "context_used": [result["content"] for result in search_results],
+                    "sources": self.build_sources(search_results),
+                }
+                for question, search_results in zip(questions, all_results)
+            ]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def answer(
+            question: str, query_embedding: List[float], search_results: List[Dict[str, Any]]
+        ) -> Dict[str, Any]:
+            if not search_results:
+                return {
+                    "question": question,
+                    "answer": NO_RESULTS_ANSWER,
+                    "context_used": [],
+                    "sources": [],
+                }
+            async with semaphore:
+                with timed("context"):
+                    context_results = await self.build_context(
+                        query_embedding, search_results, space
+                    )
+                context_chunks = [result["content"] for result in context_results]
+                response = {
+                    "question": question,
+                    "context_used": context_chunks,
+                    "sources": self.build_sources(context_results),
+                }
+                try:
+                    response["answer"] = await self.generate_response(
+                        context_chunks, question, priority=Priority.BULK
+                    )
+                except Exception as e:
+                    response["error"] = str(e)
+                return response
+
+        return await asyncio.gather(
+            *(
+                answer(question, embedding, search_results)
+                for question, embedding, search_results in zip(questions, embeddings, all_results)
+            )
+        )
+
+    async def stream_rag_query(
+        self,
+        question: str,
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Streaming RAG query: yields sources, then answer tokens, then timings"""
+        start_time = time.time()
+
+        with timed("embed"):
+            query_embedding, space = await self.embed_query(question)
+        use_cache = query_embedding and self.use_answer_cache(
+            limit, similarity_threshold, ef_search, filters, space
+        )
+        cached = await self.get_cached_answer(query_embedding) if use_cache else None
+        if cached:
+            search_results, context_results = [], []
+            sources = cached["response"]["sources"]
+        elif query_embedding:
+            search_results = await self.search_by_embedding(
+                query_embedding,
+                limit,
+                similarity_threshold,
+                ef_search=ef_search,
+                query_text=question,
+                filters=filters,
+                space=space,
+            )
+            with timed("context"):
+                context_results = await self.build_context(query_embedding, search_results, space)
+                sources = self.build_sources(context_results)
+        else:
+            search_results, context_results, sources = [], [], []
+        retrieval_time = (time.time() - start_time) * 1000
+        yield {"event": "sources", "data": {"sources": sources}}
+
+        first_token_time = None
+        if cached:
+            first_token_time = (time.time() - start_time) * 1000
+            yield {"event": "token", "data": {"text": cached["response"]["answer"]}}
+        elif not search_results:
+            yield {"event": "token", "data": {"text": NO_RESULTS_ANSWER}}
+        else:
+            context_chunks = [result["content"] for result in context_results]
+            tokens = []
+            async for token in self.generate_response_stream(context_chunks, question):
+                if first_token_time is None:
+                    first_token_time = (time.time() - start_time) * 1000
+                tokens.append(token)
+                yield {"event": "token", "data": {"text": token}}
+            response = {
+                "answer": "".join(tokens),
                 "context_used": context_chunks,
                 "sources": sources,
+            }
+            if use_cache:
+                await self.cache_answer(question, query_embedding, response, search_results)
+
+        total_time = (time.time() - start_time) * 1000
+        yield {
+            "event": "done",
+            "data": {
+                "cached": bool(cached),
+                "retrieval_time_ms": retrieval_time,
+                "time_to_first_token_ms": first_token_time,
+                "generation_time_ms": total_time - retrieval_time,
                 "processing_time_ms": total_time,
+            },
+        }
+
+    @staticmethod
+    def build_sources(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Source references shown alongside an answer"""
+        # Ids let clients fetch full text on demand from /documents
+        return [
+            {
+                "filename": result["filename"],
+                "similarity": result["similarity"],
+                "document_id": result["document_id"],
+                "chunk_id": result["id"],
             }
-        except Exception as e:
-            logger.error(f"Error in RAG query: {e}")
-            raise
+            for result in search_results
+        ]
@@ -0,0 +1,334 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import openai
+
+from app.utils.exceptions import UpstreamBusyException
+from app.utils.metrics import OPENAI_REQUESTS, record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower values are served first"""
+
+    INTERACTIVE = 0
+    BULK = 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously.
+
+    The level may go negative: a request larger than the whole bucket is let
+    through once it is full and then paid back before anything else runs.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def needed(self, cost: float, reserve: float) -> float:
+        """Level required before spending `cost` while keeping `reserve` untouched"""
+        return min(cost + reserve * self.capacity, self.capacity)
+
+    def wait_time(self, cost: float, reserve: float) -> float:
+        return max(0.0, (self.needed(cost, reserve) - self.tokens) / self.rate)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float]) -> None:
+        """Adopt the provider's view of the budget, which includes other clients' usage"""
+        if limit and limit != self.capacity:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+
+
+class OpenAIRateLimiter:
+    """Shared admission control for every OpenAI request in the process.
+
+    Requests wait for a concurrency slot and for room in the requests-per-minute
+    and tokens-per-minute buckets. The concurrency limit follows AIMD: it grows
+    by about one slot per window of successful responses and halves on 429s,
+    timeouts or when the x-ratelimit-remaining-* headers run low. Retryable
+    failures are retried with full-jitter exponential backoff (or the server's
+    retry-after). Interactive requests always go first, and bulk ones must leave
+    `interactive_reserve` of the slots and budgets free for them.
+    """
+
+    def __init__(
+        self,
+        rpm_limit: int = 3000,
+        tpm_limit: int = 1_000_000,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1,
+        interactive_reserve: float = 0.2,
+        max_retries: int = 2,
+        bulk_max_retries: int = 6,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        low_watermark: float = 0.1,
+        decrease_cooldown: float = 2.0,
+    ):
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.interactive_reserve = interactive_reserve
+        self.max_retries = {Priority.INTERACTIVE: max_retries, Priority.BULK: bulk_max_retries}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.low_watermark = low_watermark
+        self.decrease_cooldown = decrease_cooldown
+
+        # Start halfway and let successful responses open it up
+        self._limit = max(float(min_concurrency), max_concurrency / 2)
+        self._inflight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+        self._waiters: List[List[int]] = []
+        self._sequence = itertools.count()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.completed = 0
+        self.rate_limited = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def concurrency_limit(self) -> int:
+        return int(self._limit)
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[Any]],
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 1,
+    ) -> Any:
+        """Run `request` (an SDK `with_raw_response` call) under the limiter.
+
+        Returns the parsed response. Streams are parsed as soon as headers
+        arrive, so their slot is released while the body is still being read.
+        """
+        attempts = self.max_retries[priority] + 1
+        for attempt in range(attempts):
+            await self._acquire(priority, tokens)
+            start = time.perf_counter()
+            try:
+                raw = await request()
+            except openai.RateLimitError as e:
+                self._release()
+                if getattr(e, "code", None) == "insufficient_quota":
+                    # Billing, not throughput: waiting will not help
+                    self.failed += 1
+                    raise
+                retry_after = self._retry_after(e.response.headers) if e.response else None
+                self.rate_limited += 1
+                OPENAI_REQUESTS.inc("rate_limited")
+                self._decrease(pause=retry_after)
+                error: Exception = e
+            except (openai.APITimeoutError, openai.APIConnectionError) as e:
+                self._release()
+                OPENAI_REQUESTS.inc("timeout")
+                self._decrease()
+                retry_after, error = None, e
+            except openai.InternalServerError as e:
+                self._release()
+                OPENAI_REQUESTS.inc("server_error")
+                retry_after, error = None, e
+            except BaseException:
+                self._release()
+                raise
+            else:
+                self._release()
+                record_stage("openai_request", time.perf_counter() - start)
+                self._on_success(raw.headers)
+                parsed = raw.parse()
+                self._settle(tokens, parsed)
+                self.completed += 1
+                OPENAI_REQUESTS.inc("ok")
+                return parsed
+
+            if attempt + 1 >= attempts:
+                break
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after * random.uniform(1.0, 1.2))
+            self.retried += 1
+            logger.warning(
+                f"OpenAI request failed ({type(error).__name__}), "
+                f"retry {attempt + 1}/{attempts - 1} in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+        self.failed += 1
+        logger.error(f"OpenAI request failed after {attempts} attempts: {error}")
+        raise UpstreamBusyException(
+            "El proveedor de IA está saturado, intente nuevamente en unos segundos",
+            retry_after=max(1.0, self._paused_until - time.monotonic()),
+        ) from error
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return {
+            "concurrency_limit": self.concurrency_limit,
+            "inflight": self._inflight,
+            "waiting": len(self._waiters),
+            "requests_available": round(self.requests.tokens, 1),
+            "tokens_available": round(self.tokens.tokens, 1),
+            "paused_seconds": max(0.0, self._paused_until - now),
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    async def _acquire(self, priority: Priority, cost: int) -> None:
+        # Heap entries order waiters by priority, then arrival
+        entry = [int(priority), next(self._sequence)]
+        heapq.heappush(self._waiters, entry)
+        wait_start = time.perf_counter()
+        try:
+            async with self._condition:
+                while True:
+                    admitted, wait = self._try_take(entry, priority, cost)
+                    if admitted:
+                        heapq.heappop(self._waiters)
+                        # The next waiter may be admissible too
+                        self._condition.notify_all()
+                        break
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._notify()
+            raise
+        record_stage("openai_queue", time.perf_counter() - wait_start)
+
+    def _try_take(
+        self, entry: List[int], priority: Priority, cost: int
+    ) -> Tuple[bool, Optional[float]]:
+        """Take a slot and budget for the waiter, or say how long to wait (None: until notified)"""
+        now = time.monotonic()
+        if self._paused_until > now:
+            return False, self._paused_until - now
+        if self._waiters[0] is not entry:
+            return False, None
+
+        reserve = self.interactive_reserve if priority == Priority.BULK else 0.0
+        slots = self.concurrency_limit
+        if priority == Priority.BULK:
+            slots = max(1, int(slots * (1 - reserve)))
+        if self._inflight >= slots:
+            return False, None
+
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_time(1, reserve), self.tokens.wait_time(cost, reserve))
+        if wait > 0:
+            return False, wait
+
+        self.requests.tokens -= 1
+        self.tokens.tokens -= cost
+        self._inflight += 1
+        return True, None
+
+    def _release(self) -> None:
+        self._inflight -= 1
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake waiters from synchronous code paths"""
+
+        async def notify() -> None:
+            async with self._condition:
+                self._condition.notify_all()
+
+        task = asyncio.get_running_loop().create_task(notify())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_success(self, headers: Any) -> None:
+        remaining_requests = self._header_float(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = self._header_float(headers, "x-ratelimit-remaining-tokens")
+        limit_requests = self._header_float(headers, "x-ratelimit-limit-requests")
+        limit_tokens = self._header_float(headers, "x-ratelimit-limit-tokens")
+        now = time.monotonic()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        self.requests.sync(limit_requests, remaining_requests)
+        self.tokens.sync(limit_tokens, remaining_tokens)
+
+        running_low = any(
+            remaining is not None and limit and remaining / limit < self.low_watermark
+            for remaining, limit in (
+                (remaining_requests, limit_requests),
+                (remaining_tokens, limit_tokens),
+            )
+        )
+        if running_low:
+            self._decrease()
+        else:
+            # Additive increase: about one extra slot per window of successes
+            self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+
+    def _decrease(self, pause: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if pause:
+            self._paused_until = max(self._paused_until, now + pause)
+        # One congestion event usually fails a whole burst; react to it once
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        previous = self.concurrency_limit
+        self._limit = max(float(self.min_concurrency), self._limit / 2)
+        logger.warning(
+            f"OpenAI concurrency limit lowered from {previous} to {self.concurrency_limit}"
+        )
+
+    def _settle(self, estimated: int, parsed: Any) -> None:
+        """Correct the token bucket with the usage the provider reports"""
+        usage = getattr(parsed, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual:
+            self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens + estimated - actual)
+
+    @classmethod
+    def _retry_after(cls, headers: Any) -> Optional[float]:
+        retry_after = cls._header_float(headers, "retry-after-ms")
+        if retry_after is not None:
+            return retry_after / 1000
+        return cls._header_float(headers, "retry-after")
+
+    @staticmethod
+    def _header_float(headers: Any, name: str) -> Optional[float]:
+        value = headers.get(name) if headers is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
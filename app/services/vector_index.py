@@ -0,0 +1,308 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models.document import LatamDoc, LatamDocChunk
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "sync.lock"
+
+
+class VectorIndex:
+    """In-process exact vector search over a memory-mapped embedding snapshot.
+
+    Chunk embeddings are stored L2-normalized in a .npy file under snapshot_dir,
+    so cosine similarity is a single matrix-vector product. Every worker maps
+    the same file read-only and the OS page cache holds one copy. One worker at
+    a time (guarded by a file lock) compares every document's updated_at with
+    the version in the snapshot, re-reads the ones that differ and publishes a
+    new snapshot version; the others pick it up on their next sync. Comparing
+    versions instead of following a timestamp watermark also catches documents
+    committed after newer ones by long transactions.
+    """
+
+    def __init__(
+        self,
+        snapshot_dir: str,
+        session_factory,
+        dtype: str = "float32",
+        sync_interval: float = 30.0,
+    ):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be float32 or float16")
+        self.snapshot_dir = snapshot_dir
+        self.session_factory = session_factory
+        self.dtype = np.dtype(dtype)
+        self.sync_interval = sync_interval
+
+        self._version = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: List[Dict[str, Any]] = []
+        self._document_ids = np.empty(0, dtype=np.int64)
+        self._document_types = np.empty(0, dtype=object)
+        self._created_at = np.empty(0, dtype="datetime64[us]")
+        # updated_at of every document in the snapshot, to skip unchanged re-reads
+        self._document_versions: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._sync_lock = asyncio.Lock()
+
+        self.searches = 0
+        self.syncs = 0
+        self.last_sync_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether a published snapshot has been loaded"""
+        return self._matrix is not None
+
+    async def start(self) -> None:
+        """Load the current snapshot, sync it, and keep syncing in the background"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        await self.sync()
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sync(self) -> None:
+        """Publish database changes to the snapshot, or load one another worker published"""
+        async with self._sync_lock:
+            lock_file = open(os.path.join(self.snapshot_dir, LOCK_FILE), "w")
+            try:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Another worker is writing; use whatever it last published
+                    await asyncio.to_thread(self._load)
+                    return
+                await asyncio.to_thread(self._load)
+                await self._pull_changes()
+            finally:
+                lock_file.close()
+            self.syncs += 1
+            self.last_sync_at = time.time()
+
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int = 10,
+        similarity_threshold: float = 0.0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Exact top-k chunks by cosine similarity, same shape as the SQL search rows"""
+        matrix, rows = self._matrix, self._rows
+        if matrix is None or not rows or limit <= 0:
+            return []
+        self.searches += 1
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = (matrix @ query.astype(matrix.dtype)).astype(np.float32)
+
+        mask = self._filter_mask(filters or {})
+        if mask is not None:
+            scores[~mask] = -np.inf
+        if similarity_threshold > 0:
+            scores[scores < similarity_threshold] = -np.inf
+
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            similarity = float(scores[i])
+            if similarity == -np.inf:
+                break
+            results.append({**rows[i], "distance": 1 - similarity, "similarity": similarity})
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "version": self._version,
+            "chunks": len(self._rows),
+            "dtype": (self._matrix if self.ready else np.empty(0, self.dtype)).dtype.name,
+            "searches": self.searches,
+            "syncs": self.syncs,
+            "last_sync_age_seconds": (
+                time.time() - self.last_sync_at if self.last_sync_at else None
+            ),
+        }
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Vector index sync failed: {e}")
+
+    async def _pull_changes(self) -> None:
+        async with self.session_factory() as session:
+            live = {
+                doc_id: updated_at.isoformat()
+                for doc_id, updated_at in await session.execute(
+                    select(LatamDoc.id, LatamDoc.updated_at)
+                )
+            }
+
+            deleted = {int(doc_id) for doc_id in self._document_versions} - set(live)
+            # New documents and documents whose updated_at moved, whatever its value
+            changed_ids = {
+                doc_id
+                for doc_id, version in live.items()
+                if self._document_versions.get(str(doc_id)) != version
+            }
+            # The first sync publishes even an empty corpus, so workers become ready
+            if not changed_ids and not deleted and self.ready:
+                return
+
+            result = await session.execute(
+                select(
+                    LatamDocChunk.id,
+                    LatamDocChunk.document_id,
+                    LatamDocChunk.chunk_index,
+                    LatamDoc.filename,
+                    LatamDocChunk.content,
+                    LatamDocChunk.token_count,
+                    LatamDoc.document_type,
+                    LatamDoc.created_at,
+                    LatamDocChunk.embedding,
+                )
+                .join(LatamDoc, LatamDoc.id == LatamDocChunk.document_id)
+                .where(LatamDocChunk.document_id.in_(changed_ids))
+                .order_by(LatamDocChunk.id)
+            )
+            new_rows = [dict(row) for row in result.mappings().all()]
+
+        versions = {str(doc_id): version for doc_id, version in live.items()}
+        await asyncio.to_thread(self._publish, changed_ids | deleted, new_rows, versions)
+        logger.info(
+            f"Vector index synced: {len(changed_ids)} changed and {len(deleted)} deleted "
+            f"documents, {len(self._rows)} chunks in snapshot v{self._version}"
+        )
+
+    def _publish(
+        self,
+        replaced_ids: Set[int],
+        new_rows: List[Dict[str, Any]],
+        versions: Dict[str, str],
+    ) -> None:
+        """Write a new snapshot version: kept rows plus the re-read documents"""
+        version = self._version + 1
+        keep = ~np.isin(self._document_ids, list(replaced_ids))
+        kept_rows = [row for row, kept in zip(self._rows, keep) if kept]
+        rows = kept_rows + [
+            {key: value for key, value in row.items() if key != "embedding"} for row in new_rows
+        ]
+
+        vectors_path = os.path.join(self.snapshot_dir, f"vectors-{version}.npy")
+        matrix = np.lib.format.open_memmap(
+            vectors_path, mode="w+", dtype=self.dtype, shape=(len(rows), self._dimension(new_rows))
+        )
+        kept = int(keep.sum())
+        if kept:
+            matrix[:kept] = self._matrix[keep]
+        for i, row in enumerate(new_rows, start=kept):
+            matrix[i] = self._normalize(np.asarray(row["embedding"], dtype=np.float32))
+        matrix.flush()
+        del matrix
+
+        rows_path = os.path.join(self.snapshot_dir, f"rows-{version}.json")
+        with open(rows_path, "w") as f:
+            json.dump(rows, f, default=lambda value: value.isoformat())
+
+        manifest = {
+            "version": version,
+            "vectors": os.path.basename(vectors_path),
+            "rows": os.path.basename(rows_path),
+            "documents": versions,
+        }
+        manifest_tmp = os.path.join(self.snapshot_dir, f"{MANIFEST_FILE}.tmp")
+        with open(manifest_tmp, "w") as f:
+            json.dump(manifest, f)
+        # Atomic swap: readers see either the old or the new version, never a mix
+        os.replace(manifest_tmp, os.path.join(self.snapshot_dir, MANIFEST_FILE))
+
+        self._load()
+        # Keep the previous version for workers that read the old manifest just
+        # before the swap; mapped files stay valid after unlink anyway
+        for name in os.listdir(self.snapshot_dir):
+            prefix, _, suffix = name.partition("-")
+            file_version = suffix.split(".")[0]
+            if prefix in ("vectors", "rows") and file_version.isdigit():
+                if int(file_version) < version - 1:
+                    os.remove(os.path.join(self.snapshot_dir, name))
+
+    def _load(self) -> None:
+        """Map the published snapshot if it is newer than the loaded one"""
+        try:
+            with open(os.path.join(self.snapshot_dir, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            # Nothing published yet; searches stay on Postgres until something is
+            return
+        if manifest["version"] == self._version:
+            return
+
+        matrix = np.load(os.path.join(self.snapshot_dir, manifest["vectors"]), mmap_mode="r")
+        with open(os.path.join(self.snapshot_dir, manifest["rows"])) as f:
+            rows = json.load(f)
+        for row in rows:
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+
+        self._document_ids = np.array([row["document_id"] for row in rows], dtype=np.int64)
+        self._document_types = np.array([row["document_type"] for row in rows], dtype=object)
+        self._created_at = np.array([row["created_at"] for row in rows], dtype="datetime64[us]")
+        self._rows = rows
+        self._matrix = matrix
+        self._version = manifest["version"]
+        self._document_versions = manifest["documents"]
+        logger.debug(f"Loaded vector snapshot v{self._version} with {len(rows)} chunks")
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Same metadata filters as DocumentRepository.filter_clauses"""
+        mask = None
+        if filters.get("document_type"):
+            mask = self._document_types == filters["document_type"]
+        if filters.get("created_after"):
+            after = self._created_at >= self._datetime64(filters["created_after"])
+            mask = after if mask is None else mask & after
+        if filters.get("created_before"):
+            before = self._created_at < self._datetime64(filters["created_before"])
+            mask = before if mask is None else mask & before
+        return mask
+
+    def _dimension(self, new_rows: List[Dict[str, Any]]) -> int:
+        if self._matrix is not None and self._matrix.shape[1]:
+            return self._matrix.shape[1]
+        return len(new_rows[0]["embedding"]) if new_rows else 0
+
+    @staticmethod
+    def _datetime64(value: datetime) -> np.datetime64:
+        # created_at is stored as naive UTC
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(value, "us")
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
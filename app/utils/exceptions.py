@@ -1,4 +1,5 @@
 import logging
+import math
 from typing import Optional
 
 from fastapi import HTTPException
@@ -33,9 +34,24 @@ class ValidationException(RAGException):
     pass
 
 
+class UpstreamBusyException(RAGException):
+    """The AI provider kept rejecting or timing out a request after retries"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        self.retry_after = retry_after
+        super().__init__(message, error_code="upstream_busy")
+
+
 def handle_exception(exc: Exception) -> HTTPException:
     """Convert custom exceptions to HTTPException"""
-    if isinstance(exc, RAGException):
+    if isinstance(exc, UpstreamBusyException):
+        logger.warning(f"Upstream busy: {exc.message}")
+        return HTTPException(
+            status_code=503,
+            detail=exc.message,
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        )
+    elif isinstance(exc, RAGException):
         logger.error(f"RAG Exception: {exc.message}")
         return HTTPException(status_code=400, detail=exc.message)
     elif isinstance(exc, DatabaseException):
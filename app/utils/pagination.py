@@ -0,0 +1,23 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+from app.utils.exceptions import ValidationException
+
+
+def encode_cursor(distance: float, chunk_id: int) -> str:
+    """Opaque keyset cursor for the row a page ended on"""
+    payload = json.dumps([distance, chunk_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    """(distance, chunk_id) from a cursor made by encode_cursor"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        distance, chunk_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(distance), int(chunk_id)
+    except (ValueError, TypeError):
+        raise ValidationException("Cursor de paginación inválido")
@@ -0,0 +1,251 @@
+"""Local OpenAI-compatible stub for benchmarks.
+
+Serves /v1/embeddings and /v1/chat/completions with deterministic output,
+configurable latency and an optional requests-per-minute limit, so load tests
+exercise the app without calling (or paying for) the real API.
+
+Usage: python -m benchmarks.fake_openai [--port 8100] [--embedding-latency-ms 20]
+Then start the app with OPENAI_BASE_URL=http://localhost:8100/v1
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+ANSWER = (
+    "Según los documentos de política, la solicitud debe presentarse dentro del plazo "
+    "indicado y con la documentación correspondiente."
+)
+
+
+class StubSettings:
+    def __init__(
+        self,
+        dimension: int = 1536,
+        embedding_latency_ms: float = 20.0,
+        embedding_latency_per_input_ms: float = 0.5,
+        chat_latency_ms: float = 300.0,
+        stream_token_delay_ms: float = 10.0,
+        rpm_limit: int = 0,
+    ):
+        self.dimension = dimension
+        self.embedding_latency_ms = embedding_latency_ms
+        self.embedding_latency_per_input_ms = embedding_latency_per_input_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.stream_token_delay_ms = stream_token_delay_ms
+        self.rpm_limit = rpm_limit
+
+
+class RateLimiter:
+    """Token bucket refilled continuously at rpm_limit requests per minute"""
+
+    def __init__(self, rpm_limit: int):
+        self.rpm_limit = rpm_limit
+        self.tokens = float(rpm_limit)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> Optional[float]:
+        """None when allowed, otherwise seconds until a request would be"""
+        if self.rpm_limit <= 0:
+            return None
+        now = time.monotonic()
+        rate = self.rpm_limit / 60
+        self.tokens = min(self.rpm_limit, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / rate
+
+    def headers(self) -> Dict[str, str]:
+        """x-ratelimit-* headers as sent by the real API"""
+        if self.rpm_limit <= 0:
+            return {}
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm_limit),
+            "x-ratelimit-remaining-requests": str(int(self.tokens)),
+        }
+
+
+def embed_text(text: str, dimension: int) -> np.ndarray:
+    """Deterministic embedding: a sum of per-word random vectors, normalized.
+
+    Texts sharing words get similar vectors, so retrieval in benchmarks behaves
+    roughly like it does with a real model.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in TOKEN_PATTERN.findall(text.lower()) or [text]:
+        seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vector += np.random.default_rng(seed).standard_normal(dimension, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    limiter = RateLimiter(settings.rpm_limit)
+    app.state.requests = {"embeddings": 0, "embedding_inputs": 0, "chat": 0, "rate_limited": 0}
+
+    def rate_limited() -> Optional[JSONResponse]:
+        retry_after = limiter.acquire()
+        if retry_after is None:
+            return None
+        app.state.requests["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": f"{retry_after:.3f}"},
+            content={"error": {"message": "Rate limit reached", "type": "requests"}},
+        )
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request, response: Response):
+        limited = rate_limited()
+        if limited:
+            return limited
+        response.headers.update(limiter.headers())
+        body = await request.json()
+        inputs: List[str] = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimension = body.get("dimensions") or settings.dimension
+        app.state.requests["embeddings"] += 1
+        app.state.requests["embedding_inputs"] += len(inputs)
+
+        await asyncio.sleep(
+            (settings.embedding_latency_ms + settings.embedding_latency_per_input_ms * len(inputs))
+            / 1000
+        )
+
+        data = []
+        for index, text in enumerate(inputs):
+            vector = embed_text(text, dimension)
+            # The OpenAI SDK asks for base64 unless a format is given explicitly
+            if body.get("encoding_format") == "base64":
+                embedding: Any = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(count_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request, response: Response):
+        limited = rate_limited()
+        if limited:
+            return limited
+        response.headers.update(limiter.headers())
+        body = await request.json()
+        app.state.requests["chat"] += 1
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "gpt-3.5-turbo")
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in body["messages"])
+
+        if body.get("stream"):
+
+            async def event_stream():
+                await asyncio.sleep(settings.chat_latency_ms / 1000)
+                for piece in re.findall(r"\S+\s*", ANSWER):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [
+                            {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                        ],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(settings.stream_token_delay_ms / 1000)
+                done = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(
+                event_stream(), media_type="text/event-stream", headers=limiter.headers()
+            )
+
+        await asyncio.sleep(settings.chat_latency_ms / 1000)
+        completion_tokens = count_tokens(ANSWER)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": ANSWER},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str):
+        # Used by the app's readiness probe
+        return {"id": model, "object": "model", "created": 0, "owned_by": "benchmark"}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.requests
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--embedding-latency-per-input-ms", type=float, default=0.5)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--stream-token-delay-ms", type=float, default=10.0)
+    parser.add_argument("--rpm-limit", type=int, default=0, help="0 disables rate limiting")
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        dimension=args.dimension,
+        embedding_latency_ms=args.embedding_latency_ms,
+        embedding_latency_per_input_ms=args.embedding_latency_per_input_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        stream_token_delay_ms=args.stream_token_delay_ms,
+        rpm_limit=args.rpm_limit,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Load generator for the upload and search endpoints.
+
+Uploads a synthetic corpus through /documents/upload, waits for the queued
+ingestion jobs, then runs semantic search queries. Each phase uses a fixed
+number of concurrent clients; latency percentiles and throughput are written
+as JSON.
+
+Usage:
+    python -m benchmarks.fake_openai &
+    OPENAI_BASE_URL=http://localhost:8100/v1 uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load --corpus-size 200 --queries 500 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+# Vocabulary for synthetic policy documents and questions
+TOPICS = [
+    "equipaje",
+    "reembolso",
+    "cambio de vuelo",
+    "cancelación",
+    "mascotas",
+    "menores",
+    "asientos",
+    "check-in",
+    "millas",
+    "tarifas",
+    "conexiones",
+    "retrasos",
+]
+PHRASES = [
+    "El pasajero debe presentar su documento de identidad vigente.",
+    "La solicitud se procesa dentro de los siete días hábiles siguientes.",
+    "Se aplica un cargo adicional según la ruta y la clase tarifaria.",
+    "Las condiciones varían para vuelos nacionales e internacionales.",
+    "El reembolso se realiza al mismo medio de pago utilizado en la compra.",
+    "La aerolínea informará cualquier modificación por correo electrónico.",
+    "Los cambios están sujetos a disponibilidad en la nueva fecha.",
+    "En caso de retraso prolongado se ofrecerá alimentación y alojamiento.",
+]
+QUESTIONS = [
+    "¿Cómo solicito un reembolso por {topic}?",
+    "¿Qué cargos aplican a {topic}?",
+    "¿Cuál es la política de {topic} en vuelos internacionales?",
+    "¿Qué documentos necesito para {topic}?",
+]
+
+
+def make_document(index: int, words: int, rng: random.Random) -> str:
+    topic = rng.choice(TOPICS)
+    sentences = [f"Política de {topic} número {index}."]
+    while sum(len(s.split()) for s in sentences) < words:
+        sentences.append(f"{rng.choice(PHRASES)} Aplica a {rng.choice(TOPICS)}.")
+    return " ".join(sentences)
+
+
+def make_question(rng: random.Random) -> str:
+    return rng.choice(QUESTIONS).format(topic=rng.choice(TOPICS))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "requests": len(values) + sum(errors.values()),
+        "succeeded": len(values),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(values) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": sum(values) / len(values) if values else 0.0,
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else 0.0,
+        },
+    }
+
+
+async def run_phase(
+    name: str, total: int, concurrency: int, request: Callable[[int], Awaitable[httpx.Response]]
+) -> Dict[str, Any]:
+    """Issue `total` requests from `concurrency` clients and summarize their latencies"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def client() -> None:
+        for index in counter:
+            start = time.perf_counter()
+            try:
+                response = await request(index)
+                if response.status_code >= 400:
+                    key = str(response.status_code)
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    result = summarize(latencies, errors, time.perf_counter() - start)
+    print(
+        f"{name}: {result['succeeded']}/{result['requests']} ok, "
+        f"p50 {result['latency_ms']['p50']:.1f}ms, p99 {result['latency_ms']['p99']:.1f}ms, "
+        f"{result['throughput_rps']:.1f} req/s"
+    )
+    return result
+
+
+async def wait_for_jobs(
+    client: httpx.AsyncClient, job_ids: List[int], timeout: float
+) -> Dict[str, Any]:
+    """Poll queued uploads until they finish; latency is enqueue to finish"""
+    start = time.perf_counter()
+    pending = set(job_ids)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    while pending and time.perf_counter() - start < timeout:
+        for job_id in list(pending):
+            job = (await client.get(f"/documents/jobs/{job_id}")).json()
+            if job["status"] not in ("succeeded", "failed"):
+                continue
+            pending.discard(job_id)
+            if job["status"] == "failed":
+                errors["failed"] = errors.get("failed", 0) + 1
+                continue
+            created = datetime.fromisoformat(job["created_at"])
+            finished = datetime.fromisoformat(job["finished_at"])
+            latencies.append((finished - created).total_seconds() * 1000)
+        if pending:
+            await asyncio.sleep(0.5)
+    if pending:
+        errors["timeout"] = len(pending)
+
+    result = summarize(latencies, errors, time.perf_counter() - start)
+    print(
+        f"ingestion jobs: {result['succeeded']}/{len(job_ids)} done, "
+        f"p50 {result['latency_ms']['p50']:.1f}ms, p99 {result['latency_ms']['p99']:.1f}ms"
+    )
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    documents = [make_document(i, args.doc_words, rng) for i in range(args.corpus_size)]
+    questions = [make_question(rng) for _ in range(args.queries)]
+    run_id = int(time.time())
+
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout, limits=limits
+    ) as client:
+
+        job_ids: List[int] = []
+
+        async def upload(index: int) -> httpx.Response:
+            files = {
+                "file": (f"bench-{run_id}-{index}.txt", documents[index].encode(), "text/plain")
+            }
+            response = await client.post("/documents/upload", files=files)
+            if response.status_code == 202:
+                job_ids.append(response.json()["job_id"])
+            return response
+
+        async def search(index: int) -> httpx.Response:
+            return await client.post(
+                "/search/semantic-search",
+                json={"question": questions[index], "limit": args.limit},
+            )
+
+        phases = {}
+        if args.corpus_size:
+            phases["upload"] = await run_phase("upload", args.corpus_size, args.concurrency, upload)
+            # Uploads are queued; search only once the corpus is actually indexed
+            phases["ingestion_jobs"] = await wait_for_jobs(client, job_ids, args.job_timeout)
+        if args.queries:
+            phases["search"] = await run_phase("search", args.queries, args.concurrency, search)
+        app_stats = (await client.get("/stats")).json() if args.collect_stats else None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "base_url": args.base_url,
+            "corpus_size": args.corpus_size,
+            "doc_words": args.doc_words,
+            "queries": args.queries,
+            "concurrency": args.concurrency,
+            "limit": args.limit,
+            "seed": args.seed,
+        },
+        "phases": phases,
+        "app_stats": app_stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark upload and search latency")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--corpus-size", type=int, default=100, help="Documents to upload")
+    parser.add_argument("--doc-words", type=int, default=600, help="Words per document")
+    parser.add_argument("--queries", type=int, default=200, help="Search requests to send")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=5, help="Results per search")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--job-timeout", type=float, default=600.0, help="Seconds to wait for queued uploads"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/results/latest.json"))
+    parser.add_argument(
+        "--no-stats", dest="collect_stats", action="store_false", help="Skip fetching /stats"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()